@@ -1,54 +1,117 @@
-from typing import Any, Dict, List
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Dict, List, Optional
 from tools import ToolBase, ToolBoxBase, YahooFinanceTool, coin_gecko_tool_box
-from app_types import RunningTool, ToolsBetaMessage
+from app_types import ToolsBetaMessage
+from config import config
+from .running_tool_registry import RunningToolBackend, create_running_tool_backend
 
 class AnthropicHelper:
-    running_tools = []
-    tools = []
+
+    def __init__(self, running_tools: RunningToolBackend, max_workers: int):
+        self.running_tools = running_tools
+        self.tools = []
+        self.tool_registry: Dict[str, ToolBase] = {}
+        self._tools_definition: Optional[List[Dict[str, Any]]] = None
+        self._tools_definition_json: Optional[str] = None
+        self._tools_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tool_call')
 
     def add_tool(self, tool: ToolBase | ToolBoxBase):
-        self.tools.append(tool)
+        """Registers a tool, or every tool of a toolbox, by name. Duplicate names raise ValueError"""
+        tools = tool.tools if isinstance(tool, ToolBoxBase) else [tool]
+        with self._tools_lock:
+            for t in tools:
+                if t.name in self.tool_registry:
+                    raise ValueError(f"Tool {t.name} is already registered")
+            for t in tools:
+                self.tool_registry[t.name] = t
+            self.tools.append(tool)
+            self._tools_definition = None
+            self._tools_definition_json = None
     
     def get_tools(self):
         return self.tools
     
-    def get_claude_tools_definition(self):
-        definition = []
-        for tool in self.tools:
-            if isinstance(tool, ToolBoxBase):
-                definition.extend(tool.claude_tool_definition())
-            else:
-                definition.append(tool.claude_tool_definition())
-        
-        return definition
+    def get_claude_tools_definition(self) -> List[Dict[str, Any]]:
+        """Tool definitions sent to Claude, built once per registered tool set"""
+        with self._tools_lock:
+            if self._tools_definition is None:
+                self._tools_definition = [tool.claude_tool_definition() for tool in self.tool_registry.values()]
+            return self._tools_definition
+
+    def get_claude_tools_definition_json(self) -> str:
+        definition = self.get_claude_tools_definition()
+        with self._tools_lock:
+            if self._tools_definition_json is None:
+                self._tools_definition_json = json.dumps(definition)
+            return self._tools_definition_json
 
     def excecute_tool(self, tool_name):
-        for tool in self.tools:
-          t = tool.is_supported(tool_name)
-          if t:
-              return t
-        return None
+        return self.tool_registry.get(tool_name)
     
+    def run_tool(self, tool_name, tool_input):
+        logging.debug(f"Tool used: {tool_name}, input: {tool_input}")
+        tool = self.excecute_tool(tool_name)
+        if (tool):
+            return tool.run(tool_input)
+        return "no data available"
+
+    def run_tool_blocks(self, tool_use_blocks, timeout: float) -> List[Dict[str, Any]]:
+        """
+        Runs the tool_use blocks of one assistant turn concurrently.
+        Returns the tool_result contents in the blocks order; a tool slower than timeout reports an error
+        """
+        futures = [self.executor.submit(self.run_tool, block.name, block.input) for block in tool_use_blocks]
+        deadline = time.monotonic() + timeout
+        content = []
+        for block, future in zip(tool_use_blocks, futures):
+            try:
+                info = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                logging.warning(f"Tool {block.name} timed out after {timeout}s")
+                future.cancel()
+                info = "The tool took too long to respond, no data available"
+            except Exception as e:
+                logging.error(f"Tool {block.name} failed: {str(e)}")
+                info = "There was an error while trying to retrieve the information"
+            content.append({
+                'type': 'tool_result',
+                'tool_use_id': block.id,
+                'content': [{'type': 'text','text': str(info)}]
+            })
+        return content
+
     def add_running_tool(self, id: str): 
-        tool = RunningTool(id)
-        self.running_tools.append(tool)
+        return self.running_tools.add(id)
     
     def add_running_tool_result(self, id: str, result: ToolsBetaMessage):
-        for tool in self.running_tools:
-            if (tool.id == id):
-                tool.add_result(result)
+        self.running_tools.set_result(id, result)
           
+    def set_running_tool_error(self, id: str, error: str):
+        self.running_tools.set_error(id, error)
+
     def get_running_tool(self, id: str):
-        for tool in self.running_tools:
-            if (tool.id == id):
-                return tool
-        return None
+        return self.running_tools.get(id)
+
+    def wait_running_tool(self, id: str, timeout: float):
+        return self.running_tools.wait(id, timeout)
     
     def delete_running_tool(self, id: str):
-        self.running_tools = [elem for elem in self.running_tools if elem.id != id]
+        self.running_tools.delete(id)
 
 
-anthropicHelper = AnthropicHelper()
+anthropicHelper = AnthropicHelper(
+    create_running_tool_backend(
+        config.TOOL_EXECUTION_BACKEND,
+        ttl=config.TOOL_EXECUTION_TTL,
+        max_size=config.TOOL_EXECUTION_MAX
+    ),
+    max_workers=config.TOOL_CALL_WORKERS
+)
 
 yft = YahooFinanceTool()
 
@@ -1,24 +1,30 @@
-import threading
 # from anthropic.types.beta.tools import ToolParam, ToolsBetaMessageParam
 from uuid import uuid4
 from flask import request, jsonify, Response, make_response, abort, current_app as app
 from flask_restx import Namespace, Resource
 import anthropic
 import json
-import os
+import logging
 from ..auth import require_any_auth, require_token
-from services import telegram_report_error
+from services import telegram_report_error, llm_clients, metrics, JobQueue, JobQueueFullError, JobTimeoutError
+from services.job_queue import Job
+from services.streaming import StreamEvent, EventRelay, sse_response, anthropic_events, delta, usage
 from .anthropic_helper import anthropicHelper as helper
 from app_types import ToolsBetaMessage
-from res import EngMsg as msg, CustomError
+from res import EngMsg as msg, CustomError, PdfFileTooLarge, PdfExtractionTimeout
 from config import config
-from pdfminer.high_level import extract_text
-from services import PdfHandler
-from werkzeug.utils import secure_filename
+from services import PdfHandler, open_upload
 from werkzeug.datastructures import FileStorage
 
 api = Namespace('anthropic', description=msg.API_NAMESPACE_ANTHROPIC_DESCRIPTION)
-client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
+client = llm_clients.get('anthropic')
+
+tool_queue = JobQueue(
+    'anthropic_tools',
+    max_workers=config.TOOL_WORKERS,
+    max_queue=config.TOOL_QUEUE_SIZE,
+    timeout=config.TOOL_JOB_TIMEOUT)
+metrics.register('anthropic_tool_queue', tool_queue.stats)
 
 parser = api.parser()
 parser.add_argument('pdf', type=FileStorage, location='files')
@@ -33,19 +39,105 @@ def custom_serializer(obj):
         return obj.__dict__
     return obj
 
-def data_generator(response):
-    # input_token = 0
-    # output_token = 0
-    for event in response:
-        if event.type == 'message_start':
-            input_token = event.message.usage.input_tokens
-        elif event.type == 'content_block_delta':
-            text = event.delta.text
-            yield f"{text}"
-        elif event.type == 'message_delta':
-            output_tokens = event.usage.output_tokens
-    yield f"Input Token: {input_token}"
-    yield f"Output Tokens: {output_tokens}"
+def on_tool_job_error(job, error):
+    timed_out = isinstance(error, (JobTimeoutError, anthropic.APITimeoutError))
+    helper.set_running_tool_error(job.id, 'TOOL_EXECUTION_TIMEOUT' if timed_out else 'TOOL_EXECUTION_FAILED')
+
+def stream_tool_message(**kwargs):
+    """Streamed model call of the tool loop: yields the text deltas as they arrive and returns the final message"""
+    with client.beta.tools.messages.stream(**kwargs) as response_stream:
+        for text in response_stream.text_stream:
+            yield delta(text)
+        return response_stream.get_final_message()
+
+def tool_loop_events(job: Job, data, stream: bool = False):
+    """
+    Runs the tool_use loop of a tools request: the model is called again with the tool results until it stops asking for tools.
+    Yields tool_call, tool_result, delta and usage events along the way and returns the final message
+    """
+    model = data.get('model')
+    system = data.get('system')
+    max_tokens = data.get('max_tokens')
+    messages = data.get('messages')
+    tools = helper.get_claude_tools_definition()
+    input_tokens = 0
+    output_tokens = 0
+
+    def call(**kwargs):
+        nonlocal input_tokens, output_tokens
+        if stream:
+            message = yield from stream_tool_message(**kwargs)
+        else:
+            message = client.beta.tools.messages.create(**kwargs)
+        input_tokens += message.usage.input_tokens
+        output_tokens += message.usage.output_tokens
+        yield usage(input_tokens, output_tokens)
+        return message
+
+    response = yield from call(
+        model=model,
+        max_tokens=1024,
+        messages=messages,
+        tools=tools,
+        timeout=job.remaining())
+
+    if (response.stop_reason == "tool_use"):
+        while (response.stop_reason == "tool_use"):
+            job.check_deadline()
+            messages.append({"role": response.role, "content": response.content})
+            tool_use_blocks = [block for block in response.content if block.type == "tool_use"]
+            logging.debug(f"Tool use blocks size: {len(tool_use_blocks)}")
+            for block in tool_use_blocks:
+                yield StreamEvent('tool_call', {'id': block.id, 'name': block.name, 'input': block.input})
+            content = helper.run_tool_blocks(
+                tool_use_blocks,
+                timeout=min(config.TOOL_CALL_TIMEOUT, job.remaining()))
+            for result in content:
+                yield StreamEvent('tool_result', {'tool_use_id': result['tool_use_id'], 'content': result['content'][0]['text']})
+            messages.append({
+                    'role': 'user',
+                    'content': content
+                })
+            job.check_deadline()
+            response = yield from call(
+                model=model,
+                max_tokens=max_tokens,
+                system=system,
+                messages=messages,
+                tools=tools,
+                timeout=job.remaining())
+    else:
+        messages.append({"role": response.role, "content": response.content})
+    return response
+
+def stream_tool_job(job: Job, data, relay: EventRelay):
+    """tool_queue job of a streaming tools request: runs the tool loop and relays its events to the response"""
+    events = tool_loop_events(job, data, stream=True)
+    try:
+        while not relay.cancelled.is_set():
+            relay.put(next(events))
+        events.close()  # the client went away
+    except StopIteration as stop:
+        relay.put(StreamEvent('stop', {'stop_reason': stop.value.stop_reason}))
+        relay.close()
+
+def submit_stream_tool_job(data, loop=None) -> EventRelay:
+    """
+    Queues the tool loop of a streaming tools request on tool_queue and returns the relay of its events,
+    consumed on the event loop when given. Raises JobQueueFullError when the queue is full
+    """
+    # the job may wait up to the job timeout in the queue, then run for as long
+    relay = EventRelay(timeout=2 * config.TOOL_JOB_TIMEOUT, loop=loop)
+    tool_queue.submit(uuid4().hex, stream_tool_job, data, relay, on_error=lambda job, error: relay.fail(error))
+    return relay
+
+def queue_full_response(error: JobQueueFullError):
+    response = make_response(jsonify({
+        "error": "QUEUE_FULL",
+        "queue_position": error.queue_size + 1
+    }), 429)
+    response.headers['Retry-After'] = '1'
+    return response
 
 def extract_tool_response_data(message):
 
@@ -64,17 +156,10 @@ def extract_tool_response_data(message):
 def extract_response_data(response):
     return response.model_dump_json()
 
-def get_pdf_text(pdf):
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-    filename = secure_filename(pdf.filename)
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    pdf.save(file_path)
-    pdf_file = open(file_path, 'rb')
-    pdf_text = extract_text(pdf_file)
-    return {
-        "text": pdf_text,
-        "path": file_path
-    }
+def get_pdf_text(pdf: FileStorage) -> str:
+    """Text of an uploaded PDF, read from memory (or a temp file for large uploads) instead of the uploads folder"""
+    with open_upload(pdf) as pdf_file:
+        return PdfHandler().get_pdf_text(pdf_file)
 
 
 def create_message(text):
@@ -110,7 +195,7 @@ class AnthropicCompletionRes(Resource):
             data['messages'] = messages
             response = client.messages.create(**data)
             if data.get('stream'):
-                return Response(data_generator(response), mimetype='text/event-stream')
+                return sse_response(anthropic_events(response))
 
             # response = client.messages.create(**data)
             responseJson = extract_response_data(response)
@@ -137,27 +222,50 @@ class AnthropicCompletionRes(Resource):
 @api.route('/completions/tools')
 class AnthropicCompletionToolRes(Resource):
 
-    runningTools = []
-    tools = helper.get_claude_tools_definition()
+    @require_token
+    def get(self):
+        """
+        Returns the tool definitions available to the tools endpoint
+        """
+        return Response(helper.get_claude_tools_definition_json(), mimetype='application/json')
 
     @require_token
     def post(self):
         """
         Endpoint to handle Anthropic requests with Tools.
-        Receives a message from the user and creates a tool handler.
-        Returns a tool execution ID
+        Receives a message from the user and queues a tool handler.
+        Returns a tool execution ID, or 429 when the tool queue is full.
+        With stream=true the tool loop is queued the same way and its tool_call, tool_result and delta events are sent over SSE
         """
         app.logger.info('handling anthropic request')
         data = request.json
         try:
             if data.get('stream') == "True":
                 data['stream'] = True  # Convert stream to boolean
+
+            if data.get('stream') is True:
+                try:
+                    return sse_response(submit_stream_tool_job(data))
+                except JobQueueFullError as e:
+                    return queue_full_response(e)
             
             tool_execution_id = uuid4().hex
             helper.add_running_tool(tool_execution_id)
-            thread = threading.Thread(target=self.__tool_request_handler, args=(data, tool_execution_id, app.app_context()))
-            thread.start()
-            return make_response(jsonify({"id": f"{tool_execution_id}"}), 200)
+            # the error is recorded in the app context too, the database backend needs it
+            context = app.app_context()
+            try:
+                queue_position = tool_queue.submit(
+                    tool_execution_id,
+                    self.__tool_request_handler,
+                    data,
+                    tool_execution_id,
+                    context,
+                    on_error=on_tool_job_error,
+                    context=context)
+            except JobQueueFullError as e:
+                helper.delete_running_tool(tool_execution_id)
+                return queue_full_response(e)
+            return make_response(jsonify({"id": f"{tool_execution_id}", "queue_position": queue_position}), 200)
             
         
         except anthropic.APIError as e:
@@ -176,125 +284,72 @@ class AnthropicCompletionToolRes(Resource):
             app.logger.error(f"Ucnexpected Error: {str(e)}")
             raise CustomError(500, "An unexpected error occurred.")
         
-    def __tool_request_handler(self, data, tool_execution_id, context):
-        context.push()
+    def __tool_request_handler(self, job, data, tool_execution_id, context):
+        with context:
+            try:
+                self.__run_tools(job, data, tool_execution_id)
+            except anthropic.APIStatusError as e:
+                error_code = e.status_code
+                error_json = json.loads(e.response.text)
+                error_message = error_json["error"]["message"]
+                app.logger.error(f"Unexpected Error: ({error_code}) {error_message}")
+                telegram_report_error("anthropic", "NO_CHAT_ID", error_code, error_message)
+                raise
+            except Exception as e:
+                app.logger.error(f"Ucnexpected Error: {str(e)}")
+                raise
+
+    def __run_tools(self, job, data, tool_execution_id):
+        events = tool_loop_events(job, data)
         try:
-            model = data.get('model')
-            system = data.get('system')
-            max_tokens = data.get('max_tokens')
-            messages = data.get('messages')
-            response = client.beta.tools.messages.create(
-                model=model,
-                max_tokens=1024,
-                messages=messages,
-                tools=self.tools,
-            )
-            
-            if (response.stop_reason == "tool_use"):
-                while (response.stop_reason == "tool_use"): 
-                    messages.append({"role": response.role, "content": response.content})
-                    tool_use_blocks = [block for block in response.content if block.type == "tool_use"]
-                    print('Tool use blocks size', len(tool_use_blocks))
-                    
-                    if (len(tool_use_blocks) > 1):
-                        content = []
-                        for block in tool_use_blocks:
-                            tool_name = block.name
-                            tool_input = block.input
-                            print(f"\nTool Used: {tool_name}")
-                            print(f"Tool Input: {tool_input}")
-
-                            tool = helper.excecute_tool(tool_name)
-                            if (tool):
-                                info = tool.run(tool_input)
-                            else:
-                                info = "no data available"
-                            content.append({
-                                    'type': 'tool_result',
-                                    'tool_use_id': block.id,
-                                    'content': [{'type': 'text','text': str(info)}] # info
-                                })
-
-                        messages.append({
-                                'role': 'user',
-                                'content': content
-                            })
-                    
-                    else: 
-                        block = tool_use_blocks[0]
-                        tool_name = block.name
-                        tool_input = block.input
-                        print(f"\nTool Used: {tool_name}")
-                        print(f"Tool Input: {tool_input}")
-
-                        tool = helper.excecute_tool(tool_name)
-                        if (tool):
-                            info = tool.run(tool_input)
-                        else:
-                            info = "no data available"
-                        messages.append({
-                                'role': 'user',
-                                'content': [
-                                    {
-                                        'type': 'tool_result',
-                                        'tool_use_id': block.id,
-                                        'content': [{'type': 'text','text': str(info)}] # info
-                                    }
-                                ]
-                            })
-                    response = client.beta.tools.messages.create(
-                        model=model,
-                        max_tokens=max_tokens,
-                        system=system,
-                        messages=messages,
-                        stream=False,
-                        tools=self.tools)
-            else:
-                messages.append({"role": response.role, "content": response.content})
-
-            betaMessage = ToolsBetaMessage(
-                id=response.id,
-                content=response.content,
-                model=response.model,
-                role=response.role,
-                stop_reason=response.stop_reason,
-                stop_sequence=response.stop_sequence,
-                type= response.type,
-                usage=response.usage)
-            
-            helper.add_running_tool_result(tool_execution_id, betaMessage)
+            while True:
+                next(events)
+        except StopIteration as stop:
+            response = stop.value
+
+        betaMessage = ToolsBetaMessage(
+            id=response.id,
+            content=response.content,
+            model=response.model,
+            role=response.role,
+            stop_reason=response.stop_reason,
+            stop_sequence=response.stop_sequence,
+            type= response.type,
+            usage=response.usage)
         
-        except anthropic.AnthropicError as e:
-            error_code = e.status_code
-            error_json = json.loads(e.response.text)
-            error_message = error_json["error"]["message"]
-            app.logger.error(f"Unexpected Error: ({error_code}) {error_message}")
-            telegram_report_error("anthropic", "NO_CHAT_ID", error_code, error_message)
-            raise CustomError(error_code, error_message)
-        except Exception as e:
-            context.push()
-            app.logger.error(f"Ucnexpected Error: {str(e)}")
-            raise CustomError(500, "An unexpected error occurred.")
+        helper.add_running_tool_result(tool_execution_id, betaMessage)
             
 @api.route('/completions/tools/<tool_execution_id>')
 class CheckToolExecution(Resource):            
 
-    @api.doc(params={"tool_execution_id": msg.API_DOC_PARAMS_COLLECTION_NAME})
+    @api.doc(params={"tool_execution_id": msg.API_DOC_PARAMS_COLLECTION_NAME,
+                     "wait": msg.API_DOC_PARAMS_WAIT})
     @require_token        
     def get(self, tool_execution_id):
         if (tool_execution_id):
-            tool = helper.get_running_tool(tool_execution_id)
+            wait = min(max(request.args.get('wait', 0, type=float), 0), config.TOOL_EXECUTION_MAX_WAIT)
+            if wait:
+                tool = helper.wait_running_tool(tool_execution_id, wait)
+            else:
+                tool = helper.get_running_tool(tool_execution_id)
             if(not tool):
                 response = {
                     "status": 'DONE',
                     "error": 'INVALID_TOOL_EXECUTION'
                 }
+            elif tool.error:
+                helper.delete_running_tool(tool_execution_id)
+                response = {
+                    "status": 'DONE',
+                    "error": tool.error
+                }
             else:
                 result = tool.get_result()
                 if (not result):
                     response = {
                         "status": 'PROCESSING',
-                        "error": None
+                        "error": None,
+                        "queue_position": tool_queue.position(tool_execution_id)
                     }
                 else:
                     helper.delete_running_tool(tool_execution_id)
@@ -333,18 +388,16 @@ class AnthropicPDFSummary(Resource):
             system = args['system'] if args.get('system') is not None else 'Summarize this text'
             max_tokens = args['maxTokens'] if args.get('maxTokens') is not None else '1000'
             if pdf_file:
-                result = get_pdf_text(pdf_file)
-                if (result.get('text')):
-                    messages = create_message(result.get('text'))
+                pdf_text = get_pdf_text(pdf_file)
+                if (pdf_text):
+                    messages = create_message(pdf_text)
                     response = client.messages.create(
                         messages=messages, model=model, system=system, max_tokens=int(max_tokens))
                     responseJson = extract_response_data(response)
-                    os.remove(result.get('path'))
                     return responseJson, 200
             elif (url and url.lower().endswith('.pdf')):
                 pdf_handler = PdfHandler()
-                data = pdf_handler.get_pdf_from_url(url)
-                pdf_text = extract_text(data)
+                pdf_text = pdf_handler.get_pdf_text_from_url(url)
                 if (pdf_text):
                     messages = create_message(pdf_text)
                     response = client.messages.create(
@@ -366,6 +419,12 @@ class AnthropicPDFSummary(Resource):
             app.logger.error(f"API Error: ({error_code}) {error_message}")
             telegram_report_error("anthropic", "NO_CHAT_ID", error_code, error_message)            
             raise CustomError(error_code, error_message)
+        except PdfFileTooLarge as e:
+            app.logger.error(f"PDF Error: {str(e)}")
+            raise CustomError(413, str(e))
+        except PdfExtractionTimeout as e:
+            app.logger.error(f"PDF Error: {str(e)}")
+            raise CustomError(504, str(e))
         except Exception as e:
             app.logger.error(f"Unexpected Error: {str(e)}")
             raise CustomError(500, "An unexpected error occurred.")
@@ -469,6 +528,9 @@ class AnthropicCVAnalyze(Resource):
             app.logger.error(f"API Error: ({error_code}) {error_message}")
             telegram_report_error("anthropic", "NO_CHAT_ID", error_code, error_message)            
             raise CustomError(error_code, error_message)
+        except PdfExtractionTimeout as e:
+            app.logger.error(f"PDF Error: {str(e)}")
+            raise CustomError(504, str(e))
         except Exception as e:
             app.logger.error(f"Unexpected Error: {str(e)}")
             raise CustomError(500, "An unexpected error occurred.")
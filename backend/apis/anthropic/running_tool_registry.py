@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from app_types import RunningTool, ToolsBetaMessage, StoredToolsBetaMessage
+from models import db, ToolExecutions
+
+class RunningToolBackend(ABC):
+    """Storage of the tool executions polled through /completions/tools/<id>"""
+
+    poll_interval = 0.5
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+
+    @abstractmethod
+    def add(self, id: str) -> RunningTool:
+        pass
+
+    @abstractmethod
+    def set_result(self, id: str, result: ToolsBetaMessage):
+        pass
+
+    @abstractmethod
+    def set_error(self, id: str, error: str):
+        pass
+
+    @abstractmethod
+    def get(self, id: str) -> Optional[RunningTool]:
+        pass
+
+    @abstractmethod
+    def delete(self, id: str):
+        pass
+
+    def wait(self, id: str, timeout: float) -> Optional[RunningTool]:
+        """Returns the execution once it is done, or as it is after timeout seconds. Polls get() by default"""
+        deadline = time.monotonic() + timeout
+        tool = self.get(id)
+        while tool and not tool.is_done() and time.monotonic() < deadline:
+            time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+            tool = self.get(id)
+        return tool
+
+class MemoryRunningToolBackend(RunningToolBackend):
+    """Per-process registry. Entries are kept in creation order, so expiry and eviction pop from the front"""
+
+    def __init__(self, ttl: float, max_size: int):
+        super().__init__(ttl, max_size)
+        self._tools: OrderedDict[str, RunningTool] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float):
+        while self._tools:
+            tool = next(iter(self._tools.values()))
+            if not tool.is_expired(self.ttl, now):
+                break
+            self._tools.popitem(last=False)
+
+    def add(self, id: str) -> RunningTool:
+        tool = RunningTool(id)
+        with self._lock:
+            self._purge(tool.created_at)
+            while len(self._tools) >= self.max_size:
+                evicted, _ = self._tools.popitem(last=False)
+                logging.warning(f"Running tools registry full, evicting {evicted}")
+            self._tools[id] = tool
+        return tool
+
+    def set_result(self, id: str, result: ToolsBetaMessage):
+        with self._lock:
+            tool = self._tools.get(id)
+        if tool:
+            tool.add_result(result)
+
+    def set_error(self, id: str, error: str):
+        with self._lock:
+            tool = self._tools.get(id)
+        if tool:
+            tool.set_error(error)
+
+    def get(self, id: str) -> Optional[RunningTool]:
+        with self._lock:
+            self._purge(time.time())
+            return self._tools.get(id)
+
+    def delete(self, id: str):
+        with self._lock:
+            self._tools.pop(id, None)
+
+    def wait(self, id: str, timeout: float) -> Optional[RunningTool]:
+        tool = self.get(id)
+        if tool:
+            tool.wait(timeout)
+        return tool
+
+class DatabaseRunningToolBackend(RunningToolBackend):
+    """Registry shared by all the workers using the same database. Requires an app context"""
+
+    def _expiry_limit(self):
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+
+    def add(self, id: str) -> RunningTool:
+        try:
+            ToolExecutions.query.filter(ToolExecutions.created_at < self._expiry_limit()).delete()
+            overflow = ToolExecutions.query.count() - self.max_size + 1
+            if overflow > 0:
+                oldest = db.session.query(ToolExecutions.id).order_by(ToolExecutions.created_at).limit(overflow)
+                ToolExecutions.query.filter(ToolExecutions.id.in_(oldest.scalar_subquery())).delete(synchronize_session=False)
+                logging.warning(f"Running tools registry full, evicting {overflow} execution(s)")
+            db.session.add(ToolExecutions(id=id))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        return RunningTool(id)
+
+    def set_result(self, id: str, result: ToolsBetaMessage):
+        try:
+            ToolExecutions.query.filter_by(id=id).update({ToolExecutions.result: result.to_dict()})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def set_error(self, id: str, error: str):
+        try:
+            ToolExecutions.query.filter_by(id=id).update({ToolExecutions.error: error})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def get(self, id: str) -> Optional[RunningTool]:
+        # don't serve a row cached in the session, other workers update it
+        db.session.expire_all()
+        execution = ToolExecutions.query.filter(
+            ToolExecutions.id == id,
+            ToolExecutions.created_at >= self._expiry_limit()
+        ).first()
+        if not execution:
+            return None
+        tool = RunningTool(execution.id, execution.created_at.timestamp())
+        if execution.result is not None:
+            tool.add_result(StoredToolsBetaMessage(execution.result))
+        if execution.error is not None:
+            tool.set_error(execution.error)
+        return tool
+
+    def delete(self, id: str):
+        try:
+            ToolExecutions.query.filter_by(id=id).delete()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+def create_running_tool_backend(name: str, ttl: float, max_size: int) -> RunningToolBackend:
+    if name == 'database':
+        return DatabaseRunningToolBackend(ttl, max_size)
+    return MemoryRunningToolBackend(ttl, max_size)
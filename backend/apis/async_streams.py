@@ -0,0 +1,102 @@
+"""
+Async counterparts of the streaming completion endpoints, served by the ASGI app (asgi.py).
+Each handler receives the parsed request body and returns the SSE async generator
+once the upstream stream has been opened, so upstream errors still map to a CustomError.
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict
+import anthropic
+from google.api_core.exceptions import GoogleAPICallError
+from litellm import acompletion
+from services import llm_clients, telegram_report_error
+from services.streaming import async_sse_stream, async_anthropic_events, async_openai_events
+from res import CustomError
+from . import deep_seek_resource, vertex_resource
+from .anthropic.anthropic_resource import submit_stream_tool_job
+
+StreamHandler = Callable[[dict], Awaitable[AsyncIterator[str]]]
+
+def _anthropic_messages(data):
+    data['messages'] = [{"content": m["content"], "role": m["role"]} for m in data.get('messages')]
+    return data
+
+async def anthropic_stream(data: dict) -> AsyncIterator[str]:
+    client = llm_clients.get_async('anthropic')
+    try:
+        response = await client.messages.create(**_anthropic_messages(data))
+    except anthropic.AnthropicError as e:
+        error_code = getattr(e, 'status_code', 500)
+        error_message = str(e)
+        logging.error(f"API Error: ({error_code}) {error_message}")
+        telegram_report_error("anthropic", "NO_CHAT_ID", error_code, error_message)
+        raise CustomError(error_code, error_message)
+    return async_sse_stream(async_anthropic_events(response))
+
+async def anthropic_tools_stream(data: dict) -> AsyncIterator[str]:
+    # the tool loop runs on the tool queue like in WSGI mode, its events are relayed to the event loop.
+    # JobQueueFullError is answered with 429 by the router
+    relay = submit_stream_tool_job(data, loop=asyncio.get_running_loop())
+    return async_sse_stream(relay)
+
+async def xai_stream(data: dict) -> AsyncIterator[str]:
+    client = llm_clients.get_async('xai')
+    try:
+        response = await client.messages.create(**_anthropic_messages(data))
+    except anthropic.APIError as e:
+        error_code = getattr(e, 'status_code', 500)
+        error_message = str(e)
+        logging.error(f"API Error: ({error_code}) {error_message}")
+        telegram_report_error("xai", "NO_CHAT_ID", error_code, error_message)
+        raise CustomError(error_code, error_message)
+    return async_sse_stream(async_anthropic_events(response))
+
+async def deepseek_stream(data: dict) -> AsyncIterator[str]:
+    client = llm_clients.get_async('deepseek')
+    try:
+        response = await client.chat.completions.create(**deep_seek_resource.build_completion_args(data))
+    except Exception as e:
+        error_code = getattr(e, 'status_code', 500)
+        error_message = str(e)
+        logging.error(f"API Error: ({error_code}) {error_message}")
+        telegram_report_error("deepseek", "NO_CHAT_ID", error_code, error_message)
+        raise CustomError(error_code, error_message)
+    return async_sse_stream(async_openai_events(response))
+
+async def gemini_stream(data: dict) -> AsyncIterator[str]:
+    try:
+        chat_model = vertex_resource.get_gemini_model(data.get('model'), data.get('system'), data.get('max_tokens'))
+        history = vertex_resource.build_gemini_history(data.get('messages'))
+        response = await chat_model.generate_content_async(history, stream=True)
+    except GoogleAPICallError as e:
+        telegram_report_error("vertex", "NO_CHAT_ID", e.code, e.message)
+        raise CustomError(e.code, e.message)
+    return async_sse_stream(vertex_resource.async_gemini_events(response, history))
+
+async def llms_stream(data: dict) -> AsyncIterator[str]:
+    model = data.get('model') or ''
+    if model.startswith('claude'):
+        return await anthropic_stream(data)
+    elif model.startswith('gemini'):
+        return await gemini_stream(data)
+    raise CustomError(400, "Unsupported model")
+
+async def llms_j2_stream(data: dict) -> AsyncIterator[str]:
+    try:
+        response = await acompletion(**data)
+    except Exception as e:
+        error_message = str(e)
+        logging.error(f"Unexpected Error: {error_message}")
+        raise CustomError(500, "An unexpected error occurred.")
+    return async_sse_stream(async_openai_events(response))
+
+stream_handlers: Dict[str, StreamHandler] = {
+    '/anthropic/completions': anthropic_stream,
+    '/anthropic/completions/tools': anthropic_tools_stream,
+    '/xai/completions': xai_stream,
+    '/deepseek/completions': deepseek_stream,
+    '/vertex/completions/gemini': gemini_stream,
+    '/llms/completions': llms_stream,
+    '/llms/completions/j2': llms_j2_stream,
+}
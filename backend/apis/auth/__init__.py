@@ -1,11 +1,12 @@
 from .auth_resource import api
 from .auth_helper import AuthHelper
-from .auth_middleware import require_any_auth, require_jwt, require_token
+from .auth_middleware import require_any_auth, require_jwt, require_token, is_valid_api_token
 
 __all__ = [
   'api',
   'AuthHelper',
   'require_any_auth',
   'require_jwt',
-  'require_token'
+  'require_token',
+  'is_valid_api_token'
 ]
\ No newline at end of file
@@ -34,23 +34,22 @@ def require_jwt(f):
     
     return decorated
 
+def is_valid_api_token(authorization, session_token=None) -> bool:
+    """Checks a Bearer header or a session cookie against the configured API keys"""
+    if authorization:
+        token = authorization.split(' ')[1]
+        if token in app_config.config.API_KEYS:
+            return True
+    return bool(session_token and session_token in app_config.config.API_KEYS)
+
 def require_token(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_successful = False
-        token = request.headers.get('Authorization')
-        
         try:
-            if token:
-                token = token.split(' ')[1]
-                if token in app_config.config.API_KEYS:
-                    auth_successful = True
-                    
-            if not auth_successful:
-                token = request.cookies.get('session_token')
-                if token and token in app_config.config.API_KEYS:
-                    auth_successful = True
-                    
+            auth_successful = is_valid_api_token(
+                request.headers.get('Authorization'),
+                request.cookies.get('session_token')
+            )
             if not auth_successful:
                 return jsonify({"msg": "Invalid API token"}), 401
                 
@@ -22,17 +22,18 @@ class CollectionHelper:
         collection = self.db.get_collection(collection_name)
         return collection
 
+    def get_ingestion_progress(self, collection_name):
+        return self.db.get_ingestion_progress(collection_name)
+
     def collection_query(self, collection_name, prompt, conversation):
-        index = self.db.get_vector_index(collection_name)
-        if index:
-            chat_engine = index.as_chat_engine(chat_mode=ChatMode.CONTEXT) # "condense_question")
-            promptResponse = chat_engine.chat(prompt,chat_history=conversation) # chat_history=conversation
-            return {
-                "completion": str(promptResponse),
-                "price": 0.02
-            }
-        else: 
-            raise InvalidCollectionName("Collection Error", "collection doesn't exist, please try again later", 404)
+        with self.db.chat_engine(collection_name, ChatMode.CONTEXT) as chat_engine: # "condense_question")
+            if chat_engine:
+                promptResponse = chat_engine.chat(prompt,chat_history=conversation) # chat_history=conversation
+                return {
+                    "completion": str(promptResponse),
+                    "price": 0.02
+                }
+        raise InvalidCollectionName("Collection Error", "collection doesn't exist, please try again later", 404)
 
     def delete_collection(self, collection_name):
         collection = self.db.get_existing_collection(collection_name)
@@ -3,17 +3,17 @@ from flask import request, jsonify, make_response, current_app
 from flask_restx import Namespace, Resource
 from openai import OpenAIError
 import json
-import threading
 from llama_index.core.llms import ChatMessage
 # from llama_index.chat_engine.types import ChatMessage
 # from llama_index.llms.base import ChatMessage
 from ..auth import require_token
 from res import EngMsg as msg
 from storages import chromadb
-from res import PdfFileInvalidFormat, InvalidCollectionName, InvalidCollection, CustomError
+from res import PdfFileInvalidFormat, PdfFileTooLarge, PdfExtractionTimeout, InvalidCollectionName, InvalidCollection, CustomError
 from .collections_helper import CollectionHelper
 from models import db
-from services import WebCrawling, PdfHandler
+from services import WebCrawling, PdfHandler, JobQueue, JobQueueFullError, metrics
+from config import config
 from models import CollectionErrors
 
 api = Namespace('collections', description=msg.API_NAMESPACE_LLMS_DESCRIPTION)
@@ -24,6 +24,36 @@ def data_generator(response):
 
 collection_helper = CollectionHelper(chromadb)
 
+ingestion_queue = JobQueue(
+    'collection_ingestion',
+    max_workers=config.INGESTION_WORKERS,
+    max_queue=config.INGESTION_QUEUE_SIZE,
+    timeout=config.INGESTION_JOB_TIMEOUT,
+    max_retries=config.INGESTION_RETRIES,
+    retry_backoff=config.INGESTION_RETRY_BACKOFF)
+metrics.register('collection_ingestion_queue', ingestion_queue.stats)
+
+def save_collection_error(collection_name, context):
+    with context:
+        error = CollectionErrors(dict( collection_name = collection_name))
+        error.save()
+
+def until_deadline(job, chunks):
+    """Stops the ingestion with JobTimeoutError once the job exceeds INGESTION_JOB_TIMEOUT"""
+    for chunk in chunks:
+        job.check_deadline()
+        yield chunk
+
+def on_ingestion_job_submit(job):
+    collection_helper.db.begin_ingestion(job.id)
+
+def on_ingestion_job_done(job):
+    collection_helper.db.end_ingestion(job.id)
+
+def on_ingestion_job_error(job, error):
+    _, collection_name, _, context = job.args
+    save_collection_error(collection_name, context)
+
 @api.route('/reset', doc=False)
 class CollectionHandler(Resource):
     def post(self):
@@ -50,8 +80,9 @@ class AddDocument(Resource):
     def post(self):
         """
         Endpoint that creates collections
-        Receives any document (URL, PDF, voice) and creates a collection (Vector index).
-        Returns a collection ID
+        Receives any document (URL, PDF, voice) and queues the creation of its collection (Vector index).
+        A document already being ingested for the same collection attaches to that job.
+        Returns a collection ID, or 429 when the ingestion queue is full
         """
         current_app.logger.info('handling document')
         data = request.json
@@ -61,9 +92,25 @@ class AddDocument(Resource):
         try:
             if (chat_id and url):
                 collection_name = collection_helper.get_collection_name(chat_id, url)
-                thread = threading.Thread(target=self.__collection_request_handler, args=(url, collection_name, file_name, current_app.app_context()))
-                thread.start()
-                return make_response(jsonify({"collectionName": f"{collection_name}"}), 200)
+                try:
+                    queue_position = ingestion_queue.submit(
+                        collection_name,
+                        self.__collection_request_handler,
+                        url,
+                        collection_name,
+                        file_name,
+                        current_app.app_context(),
+                        on_error=on_ingestion_job_error,
+                        on_submit=on_ingestion_job_submit,
+                        on_done=on_ingestion_job_done)
+                except JobQueueFullError as e:
+                    response = make_response(jsonify({
+                        "error": "QUEUE_FULL",
+                        "queuePosition": e.queue_size + 1
+                    }), 429)
+                    response.headers['Retry-After'] = '5'
+                    return response
+                return make_response(jsonify({"collectionName": f"{collection_name}", "queuePosition": queue_position}), 200)
             else:
                 return make_response(jsonify({"error": "Bad request, parameters missing"}), 400)
         except Exception as e:
@@ -71,26 +118,29 @@ class AddDocument(Resource):
             current_app.logger.error(f"Unexpected Error: {error_message}")
             raise CustomError(500, "An unexpected error occurred.")
 
-    def __collection_request_handler(self, url, collection_name, file_name, context):
+    def __collection_request_handler(self, job, url, collection_name, file_name, context):
+        """Ingestion job. Unexpected errors are raised so the queue retries them"""
+        # created when the job was submitted, the crawled elements or PDF pages read so far tell how far it is
+        progress = collection_helper.get_ingestion_progress(collection_name)
         try:
             if (not collection_helper.is_pdf_url(url)):
                 crawl = WebCrawling()
-                text_array = crawl.get_web_content(url)
-                if text_array.get('urlText').__len__() > 0:
-                    collection_helper.db.store_text_array_from_url(text_array, collection_name)
-                else:
-                    raise InvalidCollection('Invalid collection')
+                # chunks are embedded while the page is still being chunked
+                chunks = crawl.iter_web_content(url, on_progress=progress.set_source)
             else:
                 pdf_handler = PdfHandler()
-                chunks = pdf_handler.pdf_to_chunks(url)
-                if (chunks.__len__() > 0):
-                    collection_helper.db.store_text_array(chunks, collection_name)
-                else:
-                    raise InvalidCollection('Invalid collection')
-        except (Exception, InvalidCollection) as e:
-            context.push()  
-            error = CollectionErrors(dict( collection_name = collection_name))
-            error.save()
+                # pages are embedded as they are extracted
+                chunks = pdf_handler.iter_pdf_chunks(url, on_progress=progress.set_source)
+            stored = collection_helper.db.store_text_array(
+                until_deadline(job, chunks),
+                collection_name,
+                progress=progress,
+                check_deadline=job.check_deadline)
+            if stored == 0:
+                raise InvalidCollection('Invalid collection')
+        except (InvalidCollection, PdfFileTooLarge, PdfExtractionTimeout) as e:
+            # nothing to index, retrying won't help
+            save_collection_error(collection_name, context)
 
 @api.route('/document/<collection_name>')
 class CheckDocument(Resource):
@@ -106,12 +156,22 @@ class CheckDocument(Resource):
             current_app.logger.info('Checking collection status')
             if (collection_name): 
                 collection_error = CollectionErrors.query.filter_by(collection_name=collection_name).first()
+                progress = collection_helper.get_ingestion_progress(collection_name)
                 if (collection_error):
                     response = {
                         "price": -1, # TBD
                         "status": 'DONE',
                         "error": 'INVALID_COLLECTION'
                     }
+                elif (progress is not None):
+                    response = {
+                        "price": 0,
+                        "status": 'PROCESSING',
+                        "progress": progress.percent(),
+                        "embeddedChunks": progress.done,
+                        "queuePosition": ingestion_queue.position(collection_name),
+                        "error": None
+                    }
                 else:
                     collection = collection_helper.get_collection(collection_name)
                     if (collection):
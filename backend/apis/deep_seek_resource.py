@@ -1,11 +1,10 @@
-from flask import request, Response, current_app as app
+from flask import request, current_app as app
 from flask_restx import Namespace, Resource
-from openai import OpenAI
 import json
 from .auth import require_any_auth, require_token
-from services import telegram_report_error
+from services import telegram_report_error, llm_clients
+from services.streaming import sse_response, openai_events
 from res import EngMsg as msg, CustomError
-from config import config
 
 api = Namespace('deepseek', 'DeepSeek API') # description=msg.API_NAMESPACE_DEEPSEEK_DESCRIPTION)
 
@@ -14,10 +13,7 @@ DEFAULT_HEADERS = {
     "X-Title": "Harmony LLM API",
 }
 
-client = OpenAI(
-    api_key=config.OPEN_ROUTER_DEEPSEEK_API_KEY,  
-    base_url=config.OPEN_ROUTER_DEEPSEEK_BASE_URL,
-)
+client = llm_clients.get('deepseek')
 
 def check_open_router_provider():
     return client.base_url.host.find('openrouter') != -1
@@ -28,30 +24,26 @@ def get_model_by_provider(model):
             return f"deepseek/deepseek-r1:free"
     return model
 
-def data_generator(response):
-    prompt_tokens = 0
-    completion_tokens = 0
-    try:
-        for chunk in response:
-            if hasattr(chunk, 'usage') and chunk.usage is not None:
-                usage = dict(chunk.usage)
-                prompt_tokens = usage.get('prompt_tokens', 0)
-                completion_tokens = usage.get('completion_tokens', 0)
-            elif (hasattr(chunk, 'choices') and 
-                  chunk.choices and 
-                  hasattr(chunk.choices[0], 'delta') and 
-                  hasattr(chunk.choices[0].delta, 'content') and 
-                  chunk.choices[0].delta.content is not None):
-                content = chunk.choices[0].delta.content
-                if content.strip(): 
-                    yield content
-        
-        if prompt_tokens or completion_tokens:
-            yield f"Input Tokens: {prompt_tokens}"
-            yield f"Output Tokens: {completion_tokens}"
-    except Exception as e:
-        app.logger.error(f"Streaming error: {str(e)}")
-        yield f"Error: {str(e)}"
+def build_completion_args(data):
+    # Extract messages from the request
+    messages = [{"content": m["content"], "role": m["role"]} for m in data.get('messages', [])]
+    model = get_model_by_provider(data.get('model', 'deepseek-chat'))
+    # Prepare the completion request
+    completion_args = {
+        "model": model,
+        "messages": messages,
+        "stream": data.get('stream', False)
+    }
+    # Add optional parameters if they exist in the request
+    if 'temperature' in data:
+        completion_args['temperature'] = float(data['temperature'])
+    if 'max_tokens' in data:
+        completion_args['max_tokens'] = int(data['max_tokens'])
+    if data.get('stream'):
+        completion_args['stream_options']={"include_usage": True}
+    if check_open_router_provider():
+        completion_args['extra_headers'] =DEFAULT_HEADERS
+    return completion_args
 
 @api.route('/completions')
 class DeepSeekCompletionRes(Resource):
@@ -71,30 +63,12 @@ class DeepSeekCompletionRes(Resource):
             elif data.get('stream') == "False":
                 data['stream'] = False
 
-            # Extract messages from the request
-            messages = [{"content": m["content"], "role": m["role"]} for m in data.get('messages', [])]
-            model = get_model_by_provider(data.get('model', 'deepseek-chat'))
-            # Prepare the completion request
-            completion_args = {
-                "model": model,
-                "messages": messages,
-                "stream": data.get('stream', False)
-            }
-            # Add optional parameters if they exist in the request
-            if 'temperature' in data:
-                completion_args['temperature'] = float(data['temperature'])
-            if 'max_tokens' in data:
-                completion_args['max_tokens'] = int(data['max_tokens'])
-            if data.get('stream'):
-                completion_args['stream_options']={"include_usage": True}
-            if check_open_router_provider():
-                completion_args['extra_headers'] =DEFAULT_HEADERS
-            
+            completion_args = build_completion_args(data)
             response = client.chat.completions.create(**completion_args)
             
             # Handle streaming response
             if data.get('stream'):
-                return Response(data_generator(response), mimetype='text/event-stream')
+                return sse_response(openai_events(response))
             # Handle regular response
             return response.model_dump(), 200
 
@@ -2,12 +2,12 @@
 import asyncio
 import threading
 from flask_restx import Resource, Namespace, fields
-from flask import request, current_app as app
+from flask import g, request, current_app as app
 from web3 import Web3
 from models import db
 from .deposit_helper import deposit_helper
 from ..auth import require_jwt
-from models import Transactions
+from models import Transactions, TransactionType, Users
 from datetime import datetime
 from config import config
 # const contractAbi = require('./abi/HarmonyLLMPayment.json');
@@ -44,16 +44,23 @@ async def run_deposit_monitoring():
                     app.logger.info(f"Transaction {deposit_data['transaction_hash']} already processed")
                     return
 
-                # Record deposit in database
+                user = Users.query.filter_by(address=deposit_data['user_address'].lower()).first()
+                if not user:
+                    app.logger.warning(f"No user found for deposit {deposit_data['transaction_hash']}")
+                    return
+
+                # Record deposit and update the running balance in the same db transaction
                 transaction = Transactions(
-                    user_address=deposit_data['user_address'],
-                    type='DEPOSIT',
+                    user_id=user.id,
+                    type=TransactionType.DEPOSIT,
                     amount=deposit_data['amount'],
                     tx_hash=deposit_data['transaction_hash'],
                     status='COMPLETED',
+                    transaction_metadata={'user_address': deposit_data['user_address']},
                     created_at=deposit_data['timestamp']
                 )
                 db.session.add(transaction)
+                Users.apply_balance_delta(user.id, transaction.amount)
                 db.session.commit()
                 app.logger.info(f"Processed deposit: {deposit_data['transaction_hash']}")
         except Exception as e:
@@ -128,17 +135,24 @@ class DepositResource(Resource):
             result = deposit_helper.verify_deposit(tx_hash)
             
             if result['success']:
-                # Record in database
+                # only the wallet that made the deposit can claim it, as the monitor matches deposits by address
+                user = Users.query.get(g.user.id)
+                if not user or user.address.lower() != result['user_address'].lower():
+                    app.logger.warning(f"User {g.user.id} tried to claim deposit {tx_hash} of another address")
+                    return {'error': 'Deposit was not made from your address'}, 403
+
+                # Record in database, updating the running balance atomically
                 transaction = Transactions(
-                    user_id=request.user_id,  # From JWT
-                    user_address=result['user_address'],  # CHANGED: Added user_address
-                    type='DEPOSIT',
-                    amount=float(result['amount']),
+                    user_id=g.user.id,  # From JWT
+                    type=TransactionType.DEPOSIT,
+                    amount=result['amount'],
                     tx_hash=tx_hash,
                     status='COMPLETED',
+                    transaction_metadata={'user_address': result['user_address']},
                     created_at=datetime.utcnow()
                 )
                 db.session.add(transaction)
+                Users.apply_balance_delta(g.user.id, transaction.amount)
                 db.session.commit()
                 
                 return {
@@ -151,6 +165,7 @@ class DepositResource(Resource):
             
         except Exception as e:
             app.logger.error(f"Error processing deposit verification: {e}")
+            db.session.rollback()
             return {'error': f"Error processing deposit: {str(e)}"}, 500
 
 # Start deposit monitoring when app starts
@@ -1,4 +1,4 @@
-from flask import request, jsonify, Response, make_response, current_app as app
+from flask import request, jsonify, make_response, current_app as app
 
 from .auth import require_any_auth, require_token
 
@@ -7,16 +7,12 @@ from .anthropic import AnthropicCompletionRes
 from flask_restx import Namespace, Resource
 from litellm import completion
 from openai import OpenAIError
-import json
 
 from res import EngMsg as msg, CustomError
+from services.streaming import sse_response, openai_events
 
 api = Namespace('llms', description=msg.API_NAMESPACE_LLMS_DESCRIPTION)
 
-def data_generator(response):
-    for chunk in response:
-        yield f"data: {json.dumps(chunk)}\n\n"
-
 @api.route('/completions/j2') 
 class LlmsCompletionJ2Res(Resource):
 
@@ -34,7 +30,7 @@ class LlmsCompletionJ2Res(Resource):
             # pass in data to completion function, unpack data
             response = completion(**data)
             if data['stream'] == True: 
-                return Response(data_generator(response), mimetype='text/event-stream')
+                return sse_response(openai_events(response))
         except OpenAIError as e:
             # Handle OpenAI API errors
             error_message = str(e)
@@ -1,9 +1,8 @@
 import openai
-import os
 
 from flask import g, request, jsonify, make_response, current_app as app
 from flask_restx import Namespace, Resource
-from werkzeug.utils import secure_filename
+from werkzeug.datastructures import FileStorage
 # from openai 
 
 # .types.
@@ -11,20 +10,20 @@ from werkzeug.utils import secure_filename
 # .error import OpenAIError
 from .auth import require_any_auth, require_token
 from res import EngMsg as msg, CustomError
-from services import telegram_report_error
+from services import telegram_report_error, open_upload
 from services.payment import check_balance, llm_models_manager
 
 api = Namespace('openai', description=msg.API_NAMESPACE_OPENAI_DESCRIPTION)
 
 ALLOWED_EXTENSIONS = {'wav', 'm4a', 'mp3', 'mp4'}
 
-def get_transcription(path):
+def get_transcription(file: FileStorage):
     try:
-        audio_file = open(path, 'rb')
-        response = openai.Audio.transcribe(
-            model="whisper-1",
-            file=audio_file
-        )
+        with open_upload(file) as audio_file:
+            response = openai.Audio.transcribe(
+                model="whisper-1",
+                file=audio_file
+            )
         return response.text 
     except Exception as e:
         app.logger.error(f"Transcription error: {str(e)}")
@@ -54,13 +53,7 @@ class UploadAudioFile(Resource):
                 return make_response(jsonify({"error": 'No selected file'})), 400
                 
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
-                
-                transcription = get_transcription(file_path)
-                os.remove(file_path)
+                transcription = get_transcription(file)
                 
                 if not transcription:
                     return make_response(jsonify({"error": 'Transcription failed'})), 500
@@ -1,8 +1,7 @@
 import os
-from flask import g, request, Response, jsonify, make_response, current_app as app
+from flask import g, request, jsonify, make_response, current_app as app
 from flask_restx import Namespace, Resource
 from vertexai.language_models import ChatModel, ChatMessage
-from vertexai.preview.generative_models import GenerativeModel
 from vertexai.generative_models import ResponseValidationError
 from google.api_core.exceptions import GoogleAPICallError, ClientError
 import google.generativeai as genai
@@ -12,8 +11,11 @@ import vertexai
 import json
 
 from .auth import require_any_auth, require_token
-from services import telegram_report_error
+from services import telegram_report_error, metrics, estimate_tokens
 from services.payment import llm_models_manager
+from services.streaming import sse_response, delta, usage
+from services.cache import LRUCache
+from config import config
 from res import EngMsg as msg, CustomError
 from services.payment.decorators import check_balance
 
@@ -29,27 +31,107 @@ vertexai.init(project=project_id, location="us-central1")
 
 api = Namespace('vertex', description=msg.API_NAMESPACE_VERTEX_DESCRIPTION, path='/vertex')
 
+model_cache = LRUCache(config.VERTEX_MODEL_CACHE_SIZE, name='vertex_models')
+metrics.register('vertex_model_cache', model_cache.stats)
+
 def basic_data_generator(response):
     for event in response:
         yield f"Text: {event.text}"
 
-def data_generator(response, input_token_count, model: GenerativeModel):
-    completion = ""
-    for chunk in response:
-        if chunk is not None:
-            try:
-                if hasattr(chunk, 'text'):
-                    completion += chunk.text + " "
-                    yield f"{chunk.text}"
-            except (ValueError, Exception):
-                continue
-                
+def contents_text(contents) -> str:
+    """Flattens Gemini contents into plain text, for estimating usage Gemini doesn't report"""
+    if isinstance(contents, str):
+        return contents
+    return ' '.join(part for item in contents for part in item.get('parts', []))
+
+def get_usage_metadata(response):
+    """Returns (prompt, completion) token counts reported by Gemini, if any"""
+    metadata = getattr(response, 'usage_metadata', None)
+    if metadata and getattr(metadata, 'prompt_token_count', 0):
+        return metadata.prompt_token_count, getattr(metadata, 'candidates_token_count', 0)
+    return None
+
+def chunk_text(chunk):
     try:
-        completion_tokens = model.count_tokens(completion)
-        yield f"Input Token: {input_token_count}"
-        yield f"Output Tokens: {completion_tokens.total_tokens}"
-    except Exception:
-        pass
+        return chunk.text
+    except (ValueError, Exception):
+        return None
+
+def gemini_usage(reported, history, completion):
+    if reported:
+        return usage(*reported)
+    return usage(estimate_tokens(contents_text(history)), estimate_tokens(''.join(completion)))
+
+def gemini_events(response, history):
+    completion = []
+    reported = None
+    for chunk in response:
+        if chunk is None:
+            continue
+        reported = get_usage_metadata(chunk) or reported
+        text = chunk_text(chunk)
+        if text:
+            completion.append(text)
+            yield delta(text)
+    yield gemini_usage(reported, history, completion)
+
+async def async_gemini_events(response, history):
+    completion = []
+    reported = None
+    async for chunk in response:
+        if chunk is None:
+            continue
+        reported = get_usage_metadata(chunk) or reported
+        text = chunk_text(chunk)
+        if text:
+            completion.append(text)
+            yield delta(text)
+    yield gemini_usage(reported, history, completion)
+
+def build_generation_config(max_output_tokens):
+    return genai.GenerationConfig(
+        max_output_tokens=int(max_output_tokens),
+        temperature=0.1,
+        top_p=1.0,
+        top_k=40,
+    )
+
+def get_gemini_model(model, system_instruction, max_output_tokens) -> genai.GenerativeModel:
+    """Returns a cached Gemini model handle for the model/system prompt/generation config"""
+    key = ('gemini', model, system_instruction, int(max_output_tokens))
+    return model_cache.get_or_create(key, lambda: genai.GenerativeModel(
+        model,
+        system_instruction=system_instruction,
+        generation_config=build_generation_config(max_output_tokens)
+    ))
+
+def get_chat_model(model) -> ChatModel:
+    return model_cache.get_or_create(('chat', model), lambda: ChatModel.from_pretrained(model))
+
+def build_gemini_history(messages):
+    """Converts the request messages into Gemini chat history"""
+    # Handle message format
+    if not all(
+        isinstance(m, dict) and
+        set(m.keys()) == {"parts", "role"} and
+        isinstance(m["parts"], dict) and
+        set(m["parts"].keys()) == {"text"} and
+        m["role"] in ["model", "user"]
+        for m in messages
+    ):
+        messages = [
+            {"parts": {"text": m["content"]}, "role": "model" if m["role"] != "user" else "user"}
+            for m in messages
+        ]
+
+    history = []
+    for item in messages:
+        if isinstance(item, dict) and 'parts' in item and isinstance(item['parts'], dict) and 'text' in item['parts']:
+            text = item['parts']['text']
+            role = item.get('role')
+            if text and role:
+                history.append({'role': role, 'parts': [text]})
+    return history
 
 @api.route('/completions')
 class VertexCompletionRes(Resource):
@@ -66,7 +148,7 @@ class VertexCompletionRes(Resource):
             if data.get('stream') == "True":
                 data['stream'] = True
 
-            chat_model = ChatModel.from_pretrained("chat-bison@001")
+            chat_model = get_chat_model("chat-bison@001")
             parameters = {
                 "max_output_tokens": 800,
                 "temperature": 0.2
@@ -118,64 +200,35 @@ class VertexGeminiCompletionRes(Resource):
             system_instruction = data.get('system')
             max_output_tokens = data.get('max_tokens')
             
-            generation_config = genai.GenerationConfig(
-                max_output_tokens=int(max_output_tokens),
-                temperature=0.1,
-                top_p=1.0,
-                top_k=40,
-            )
-
-            chat_model = genai.GenerativeModel(model, system_instruction=system_instruction)
+            chat_model = get_gemini_model(model, system_instruction, max_output_tokens)
             
-            # Handle message format
-            if all(
-                isinstance(m, dict) and
-                set(m.keys()) == {"parts", "role"} and
-                isinstance(m["parts"], dict) and
-                set(m["parts"].keys()) == {"text"} and
-                m["role"] in ["model", "user"]
-                for m in data.get('messages')
-            ):
-                messages = data.get('messages')
-            else:
-                messages = [
-                    {"parts": {"text": m["content"]}, "role": "model" if m["role"] != "user" else "user"}
-                    for m in data.get('messages')
-                ]
-
-            history = []
-            for item in messages:
-                if isinstance(item, dict) and 'parts' in item and isinstance(item['parts'], dict) and 'text' in item['parts']:
-                    text = item['parts']['text']
-                    role = item.get('role')
-                    if text and role:
-                        history.append({'role': role, 'parts': [text]})
-
-            input_tokens = chat_model.count_tokens(history)
+            history = build_gemini_history(data.get('messages'))
+
             
             if data['stream']:
-                response = chat_model.generate_content(history, generation_config=generation_config, stream=True)
+                response = chat_model.generate_content(history, stream=True)
                 
                 if g.is_jwt_user:
                     llm_models_manager.record_transaction(
                         user_id=g.user.id,
                         model_version=model,
-                        tokens_input=input_tokens.total_tokens,
+                        tokens_input=estimate_tokens(contents_text(history)),
                         tokens_output=0,
                         endpoint=request.path,
                         status='success',
                         amount=g.estimated_cost
                     )
                     
-                return Response(data_generator(response, input_tokens.total_tokens, chat_model), mimetype='text/event-stream')
+                return sse_response(gemini_events(response, history))
             else:
-                response = chat_model.generate_content(history, generation_config=generation_config, stream=False)
+                response = chat_model.generate_content(history, stream=False)
                 if g.is_jwt_user:
+                    reported = get_usage_metadata(response)
                     llm_models_manager.record_transaction(
                         user_id=g.user.id,
                         model_version=model,
-                        tokens_input=input_tokens.total_tokens,
-                        tokens_output=0,
+                        tokens_input=reported[0] if reported else estimate_tokens(contents_text(history)),
+                        tokens_output=reported[1] if reported else 0,
                         endpoint=request.path,
                         status='success',
                         amount=g.estimated_cost
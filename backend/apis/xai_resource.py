@@ -1,34 +1,16 @@
 import anthropic.types
-from flask import request, Response, current_app as app
+from flask import request, current_app as app
 from flask_restx import Namespace, Resource
 import anthropic
-import json
 from .auth import require_token
 from res import EngMsg as msg, CustomError
-from config import config
 from services.telegram import telegram_report_error
+from services import llm_clients
+from services.streaming import sse_response, anthropic_events
 
 api = Namespace('xai', description=msg.API_NAMESPACE_XAI_DESCRIPTION)
 
-client = anthropic.Anthropic(
-    base_url="https://api.x.ai",
-    api_key=config.XAI_API_KEY, 
-)
-
-def data_generator(response):
-    # input_token = 0
-    # output_token = 0
-    for event in response:
-        if event.type == 'message_start':
-            input_token = event.message.usage.input_tokens
-        elif event.type == 'content_block_delta':
-            text = event.delta.text
-            yield f"{text}"
-        elif event.type == 'message_delta':
-            output_tokens = event.usage.output_tokens
-    yield f"Input Token: {input_token}"
-    yield f"Output Tokens: {output_tokens}"
-
+client = llm_clients.get('xai')
 
 def extract_response_data(response):
     return response.model_dump_json()
@@ -52,7 +34,7 @@ class XaiCompletionRes(Resource):
             data['messages'] = messages
             response = client.messages.create(**data)
             if data.get('stream'):
-                return Response(data_generator(response), mimetype='text/event-stream')
+                return sse_response(anthropic_events(response))
 
             # response = client.messages.create(**data)
             responseJson = extract_response_data(response)
@@ -1,7 +1,9 @@
-from .tools_model import ToolsBetaMessage, RunningTool
+from .tools_model import ToolsBetaMessage, RunningTool, StoredToolsBetaMessage
 from .stock_info import StockInfo
 
 __all__ = [
   'StockInfo',
   'ToolsBetaMessage',
+  'RunningTool',
+  'StoredToolsBetaMessage',
 ]
\ No newline at end of file
@@ -1,3 +1,5 @@
+import threading
+import time
 from typing import Any, Dict, List
 
 class TextBlock:
@@ -46,14 +48,42 @@ class ToolsBetaMessage:
             'usage': self.usage.to_dict()
         }
 
+class StoredToolsBetaMessage:
+    """A ToolsBetaMessage loaded back from its dict form"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.data
+
 class RunningTool:
 
-    def __init__(self, id: str):
+    def __init__(self, id: str, created_at: float = None):
         self.id = id
         self.result = None
+        self.error = None
+        self.created_at = created_at if created_at is not None else time.time()
+        self._done = threading.Event()
     
     def add_result(self, message: ToolsBetaMessage):
         self.result = message
+        self._done.set()
 
     def get_result(self):
         return self.result
+
+    def set_error(self, error: str):
+        self.error = error
+        self._done.set()
+
+    def is_done(self) -> bool:
+        return self.result is not None or self.error is not None
+
+    def wait(self, timeout: float) -> bool:
+        """Blocks until a result or an error is set, up to timeout seconds"""
+        return self._done.wait(timeout)
+
+    def is_expired(self, ttl: float, now: float = None) -> bool:
+        now = now if now is not None else time.time()
+        return now - self.created_at > ttl
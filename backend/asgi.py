@@ -0,0 +1,110 @@
+# asgi.py
+import json
+import logging
+from a2wsgi import WSGIMiddleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from application import app as flask_app
+from apis.async_streams import stream_handlers
+from apis.auth import is_valid_api_token
+from res import CustomError
+from services import llm_clients, JobQueueFullError
+from services.streaming import SSE_HEADERS
+from config import config
+
+class StreamingRouter:
+    """
+    ASGI entry point. Streaming completion requests are served by async generators
+    on the event loop, everything else is forwarded to the Flask (WSGI) app.
+    """
+
+    def __init__(self, wsgi_app, handlers):
+        self.wsgi = WSGIMiddleware(wsgi_app, workers=config.WSGI_THREADS)
+        self.handlers = handlers
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        handler = self.handlers.get(scope.get('path', '').rstrip('/'))
+        if scope['type'] != 'http' or scope['method'] != 'POST' or handler is None:
+            return await self.wsgi(scope, receive, send)
+
+        # the body is read once and replayed if the request goes to the WSGI app,
+        # later receive() calls (disconnect) go to the server
+        request = Request(scope, receive)
+        body = await request.body()
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            data = {}
+        if data.get('stream') == "True":
+            data['stream'] = True
+        if data.get('stream') is not True:
+            return await self.wsgi(scope, replay, send)
+
+        # the streaming response listens for the client disconnect on the server's receive
+        response = await self.stream(request, data, handler)
+        await response(scope, receive, send)
+
+    async def stream(self, request: Request, data: dict, handler):
+        try:
+            authorized = is_valid_api_token(
+                request.headers.get('Authorization'),
+                request.cookies.get('session_token')
+            )
+        except Exception:
+            authorized = False
+        if not authorized:
+            return JSONResponse({"msg": "Invalid API token"}, status_code=401)
+
+        try:
+            generator = await handler(data)
+        except JobQueueFullError as error:
+            return JSONResponse({
+                "error": "QUEUE_FULL",
+                "queue_position": error.queue_size + 1
+            }, status_code=429, headers={'Retry-After': '1'})
+        except CustomError as error:
+            return JSONResponse({
+                "error": {
+                    "status_code": error.error_code,
+                    "message": error.message
+                }
+            }, status_code=error.error_code)
+        except Exception as e:
+            logging.error(f"Unexpected Error: {str(e)}")
+            return JSONResponse({
+                "error": {
+                    "status_code": 500,
+                    "message": "An unexpected error occurred."
+                }
+            }, status_code=500)
+        return StreamingResponse(generator, media_type='text/event-stream', headers=SSE_HEADERS)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await llm_clients.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+# streamed responses don't go through Flask-CORS: same policy as CORS(app), applied to every response
+application = CORSMiddleware(
+    StreamingRouter(flask_app, stream_handlers),
+    allow_origins=['*'],
+    allow_methods=['*'],
+    allow_headers=['*'])
@@ -18,11 +18,34 @@ class Config(object):
     DEBUG = str_to_bool(os.environ.get('DEBUG', 'False'))
     TESTING = str_to_bool(os.environ.get('TESTING', 'False'))
     MAX_WORKERS = 10
+    SERVER_MODE = os.environ.get('SERVER_MODE') if os.environ.get('SERVER_MODE') else 'wsgi' # wsgi | asgi
+    WSGI_THREADS = int(os.environ.get('WSGI_THREADS', 32)) # threads serving the Flask app (waitress, or the WSGI adapter in asgi mode), each long-polling status request holds one
     CHROMADB_SERVER_URL = os.getenv('CHROMADB_SERVER_URL')
     CHROMA_SERVER_PATH = os.getenv('CHROMA_SERVER_PATH') if os.getenv('CHROMA_SERVER_PATH') else "/app/data/chroma"
+    VECTOR_INDEX_CACHE_SIZE = int(os.environ.get('VECTOR_INDEX_CACHE_SIZE', 64)) # collections
+    EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 64)) # chunks per embedding request
+    EMBEDDING_CONCURRENCY = int(os.environ.get('EMBEDDING_CONCURRENCY', 4)) # embedding requests in flight per ingestion
+    EMBEDDING_CACHE_COLLECTION = os.environ.get('EMBEDDING_CACHE_COLLECTION') if os.environ.get('EMBEDDING_CACHE_COLLECTION') else 'embedding_cache'
+    INGESTION_WORKERS = int(os.environ.get('INGESTION_WORKERS', 2))
+    INGESTION_QUEUE_SIZE = int(os.environ.get('INGESTION_QUEUE_SIZE', 32))
+    INGESTION_JOB_TIMEOUT = float(os.environ.get('INGESTION_JOB_TIMEOUT', 900)) # seconds
+    INGESTION_RETRIES = int(os.environ.get('INGESTION_RETRIES', 2))
+    INGESTION_RETRY_BACKOFF = float(os.environ.get('INGESTION_RETRY_BACKOFF', 5)) # seconds, doubled on every retry
+    CHAT_ENGINE_POOL_SIZE = int(os.environ.get('CHAT_ENGINE_POOL_SIZE', 4)) # idle chat engines kept per collection
     OPENAI_MODEL = os.getenv('OPENAI_MODEL') if os.getenv('OPENAI_MODEL') else "gpt-3.5-turbo"
     OPENAI_MAX_TOKENS = os.getenv('OPENAI_MAX_TOKENS') if os.getenv('OPENAI_MAX_TOKENS') else 600
     WEB_CRAWLER_HTTP = os.environ.get('WEB_CRAWLER_HTTP')
+    UPLOAD_SPOOL_MAX_SIZE = int(os.environ.get('UPLOAD_SPOOL_MAX_SIZE', 10 * 1024 * 1024)) # bytes of an upload kept in memory, larger ones use a temp file
+    PDF_MAX_DOWNLOAD_SIZE = int(os.environ.get('PDF_MAX_DOWNLOAD_SIZE', 50 * 1024 * 1024)) # bytes
+    PDF_SPOOL_MAX_SIZE = int(os.environ.get('PDF_SPOOL_MAX_SIZE', 5 * 1024 * 1024)) # bytes kept in memory before spilling to a temp file
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR') if os.getenv('PDF_CACHE_DIR') else "/app/data/pdf_cache"
+    PDF_CACHE_MAX_SIZE = int(os.environ.get('PDF_CACHE_MAX_SIZE', 512 * 1024 * 1024)) # bytes, 0 disables the cache
+    PDF_EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS', 2)) # processes
+    PDF_EXTRACTION_CONCURRENCY = int(os.environ.get('PDF_EXTRACTION_CONCURRENCY', 4)) # documents extracted at once
+    PDF_EXTRACTION_TIMEOUT = float(os.environ.get('PDF_EXTRACTION_TIMEOUT', 120)) # seconds per document
+    PDF_EXTRACTION_PAGES_PER_TASK = int(os.environ.get('PDF_EXTRACTION_PAGES_PER_TASK', 20))
+    WEB_CRAWL_CHUNK_TOKENS = int(os.environ.get('WEB_CRAWL_CHUNK_TOKENS', 800))
+    WEB_CRAWL_CHUNK_OVERLAP = int(os.environ.get('WEB_CRAWL_CHUNK_OVERLAP', 80)) # tokens repeated from the previous chunk
     ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
     API_KEYS = os.environ.get("API_KEYS").split(',') if os.environ.get("API_KEYS") else []
     LUMAAI_API_KEY = os.environ.get("LUMAAI_API_KEY")
@@ -38,6 +61,31 @@ class Config(object):
     DEEPSEEK_BASE_URL = "https://api.deepseek.com"
     OPEN_ROUTER_DEEPSEEK_API_KEY = os.environ.get('OPEN_ROUTER_DEEPSEEK_API_KEY')
     OPEN_ROUTER_DEEPSEEK_BASE_URL = "https://openrouter.ai/api/v1"
+    LLM_POOL_MAX_CONNECTIONS = int(os.environ.get('LLM_POOL_MAX_CONNECTIONS', 100))
+    LLM_POOL_MAX_KEEPALIVE = int(os.environ.get('LLM_POOL_MAX_KEEPALIVE', 20))
+    LLM_POOL_KEEPALIVE_EXPIRY = float(os.environ.get('LLM_POOL_KEEPALIVE_EXPIRY', 30))
+    LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 10))
+    LLM_READ_TIMEOUT = float(os.environ.get('LLM_READ_TIMEOUT', 600))
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 2))
+    VERTEX_MODEL_CACHE_SIZE = int(os.environ.get('VERTEX_MODEL_CACHE_SIZE', 32))
+    TOOL_EXECUTION_BACKEND = os.environ.get('TOOL_EXECUTION_BACKEND') if os.environ.get('TOOL_EXECUTION_BACKEND') else 'memory' # memory | database
+    TOOL_EXECUTION_TTL = int(os.environ.get('TOOL_EXECUTION_TTL', 600)) # seconds
+    TOOL_EXECUTION_MAX = int(os.environ.get('TOOL_EXECUTION_MAX', 1000))
+    TOOL_EXECUTION_MAX_WAIT = float(os.environ.get('TOOL_EXECUTION_MAX_WAIT', 30)) # seconds a status request may block (a waitress thread in wsgi mode)
+    TOOL_WORKERS = int(os.environ.get('TOOL_WORKERS', 8))
+    TOOL_QUEUE_SIZE = int(os.environ.get('TOOL_QUEUE_SIZE', 64))
+    TOOL_JOB_TIMEOUT = float(os.environ.get('TOOL_JOB_TIMEOUT', 120)) # seconds
+    TOOL_CALL_WORKERS = int(os.environ.get('TOOL_CALL_WORKERS', 16))
+    TOOL_CALL_TIMEOUT = float(os.environ.get('TOOL_CALL_TIMEOUT', 20)) # seconds
+    TOOL_CACHE_SIZE = int(os.environ.get('TOOL_CACHE_SIZE', 1024))
+    YAHOO_FINANCE_CACHE_TTL = float(os.environ.get('YAHOO_FINANCE_CACHE_TTL', 300)) # seconds, 0 disables
+    YAHOO_FINANCE_CACHE_STALE_TTL = float(os.environ.get('YAHOO_FINANCE_CACHE_STALE_TTL', 300)) # seconds a stale result is served while refreshing
+    COIN_GECKO_PRICE_CACHE_TTL = float(os.environ.get('COIN_GECKO_PRICE_CACHE_TTL', 60)) # seconds, 0 disables
+    COIN_GECKO_PRICE_CACHE_STALE_TTL = float(os.environ.get('COIN_GECKO_PRICE_CACHE_STALE_TTL', 15)) # seconds a stale price is served while refreshing
+    COIN_GECKO_SNAPSHOT_PATH = os.getenv('COIN_GECKO_SNAPSHOT_PATH') if os.getenv('COIN_GECKO_SNAPSHOT_PATH') else "/app/data/coin_gecko_coins.json"
+    COIN_GECKO_REFRESH_INTERVAL = int(os.environ.get('COIN_GECKO_REFRESH_INTERVAL', 86400)) # seconds
+    COIN_GECKO_PRICE_BATCH_WINDOW = float(os.environ.get('COIN_GECKO_PRICE_BATCH_WINDOW', 0.05)) # seconds
+    COIN_GECKO_PRICE_BATCH_SIZE = int(os.environ.get('COIN_GECKO_PRICE_BATCH_SIZE', 250)) # coin ids per request
 
 
 config = Config()
@@ -0,0 +1,33 @@
+"""add running balance to users
+
+Revision ID: 3f1c9a7d2b45
+Revises: 77120d842962
+Create Date: 2026-10-18 10:02:11.481503
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2b45'
+down_revision = '77120d842962'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('balance', sa.Numeric(precision=18, scale=8), nullable=False, server_default='0'))
+
+    # backfill the running balance from the existing transactions
+    op.execute(
+        "UPDATE users SET balance = ("
+        "SELECT COALESCE(SUM(transactions.amount), 0) FROM transactions "
+        "WHERE transactions.user_id = users.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('balance')
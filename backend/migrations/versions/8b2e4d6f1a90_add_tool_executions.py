@@ -0,0 +1,35 @@
+"""add tool executions
+
+Revision ID: 8b2e4d6f1a90
+Revises: 3f1c9a7d2b45
+Create Date: 2026-10-18 11:40:27.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a90'
+down_revision = '3f1c9a7d2b45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tool_executions',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tool_executions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tool_executions_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tool_executions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tool_executions_created_at'))
+
+    op.drop_table('tool_executions')
@@ -9,6 +9,7 @@ db = SQLAlchemy(model_class=Base)
 from .collection_errors import CollectionErrors
 from .auth import Tokens, Users, SignInRequests
 from .transactions import Transactions
+from .tool_executions import ToolExecutions
 from .enums import TransactionType, UserType
 from .llm_data import *
 
@@ -19,6 +20,7 @@ __all__ = [
   'Users',
   'SignInRequests',
   'Transactions',
+  'ToolExecutions',
   'TransactionType',
   'UserType',
   'Provider',
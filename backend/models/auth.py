@@ -22,13 +22,26 @@ class Users(db.Model):
     username = db.Column(db.String(100), unique=True, nullable=False)
     user_type = db.Column(db.Enum(UserType), nullable=False, default=UserType.WALLET)
     is_active = db.Column(db.Boolean, default=True)
+    balance = db.Column(db.Numeric(precision=18, scale=8), nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     @staticmethod
     def generate_username(address: str) -> str:
         return address.replace('0x', '')[:6]
     
+    @staticmethod
+    def apply_balance_delta(user_id: int, amount) -> None:
+        """Add amount to the running balance inside the caller's db transaction"""
+        db.session.query(Users).filter(Users.id == user_id).update(
+            {Users.balance: Users.balance + amount},
+            synchronize_session=False
+        )
+    
     def get_balance(self):
+        """Return the running balance kept in sync with transactions"""
+        return self.balance or 0
+    
+    def compute_balance(self):
         """Calculate current balance from transactions"""
         result = db.session.query(func.sum(Transactions.amount)).filter(
             Transactions.user_id == self.id
@@ -0,0 +1,10 @@
+from datetime import datetime, timezone
+from . import db
+
+class ToolExecutions(db.Model):
+    __tablename__ = 'tool_executions'
+
+    id = db.Column(db.String(32), primary_key=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
@@ -0,0 +1,22 @@
+# pdf_pages.py
+"""
+Page counting and text extraction run in the PDF extraction worker processes (services/pdf_extraction.py).
+This module only imports pdfminer: the workers preload it instead of the application.
+"""
+from io import BytesIO
+from typing import IO, Union
+from pdfminer.high_level import extract_text
+from pdfminer.pdfpage import PDFPage
+
+PdfSource = Union[bytes, str]  # PDF content, or the path of a PDF file
+
+def open_source(source: PdfSource) -> IO[bytes]:
+    return open(source, 'rb') if isinstance(source, str) else BytesIO(source)
+
+def count_pages(source: PdfSource) -> int:
+    with open_source(source) as pdf_file:
+        return sum(1 for _ in PDFPage.get_pages(pdf_file))
+
+def extract_pages(source: PdfSource, first_page: int, last_page: int) -> str:
+    with open_source(source) as pdf_file:
+        return extract_text(pdf_file, page_numbers=range(first_page, last_page))
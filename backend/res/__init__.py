@@ -3,7 +3,7 @@ import sys
 from config import config
 
 from .text_messages import EngMsg
-from .llm_exceptions import InvalidCollectionName, PdfFileInvalidFormat, DatabaseError, InvalidCollection, Web3ConnectionError
+from .llm_exceptions import InvalidCollectionName, PdfFileInvalidFormat, PdfFileTooLarge, PdfExtractionTimeout, DatabaseError, InvalidCollection, Web3ConnectionError
 from .custom_error import CustomError
 
 
@@ -23,6 +23,8 @@ __all__ = [
     'EngMsg',
     'InvalidCollectionName',
     'PdfFileInvalidFormat',
+    'PdfFileTooLarge',
+    'PdfExtractionTimeout',
     'DatabaseError',
     'InvalidCollection',
     'CustomError',
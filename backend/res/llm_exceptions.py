@@ -2,6 +2,14 @@ class PdfFileInvalidFormat(Exception):
     def __init__(self,*args,**kwargs):
         Exception.__init__(self,*args,**kwargs)
 
+class PdfFileTooLarge(Exception):
+    def __init__(self,*args,**kwargs):
+        Exception.__init__(self,*args,**kwargs)
+
+class PdfExtractionTimeout(Exception):
+    def __init__(self,*args,**kwargs):
+        Exception.__init__(self,*args,**kwargs)
+
 class InvalidCollectionName(Exception):
     def __init__(self,*args,**kwargs):
         Exception.__init__(self,*args,**kwargs)
@@ -20,4 +20,5 @@ pass applicant tracking systems and highlight expertise."""
     API_DOC_PARAMS_SYSTEM = 'Completion context (default "Summarize this text")'
     API_DOC_PARAMS_MODEL = 'Completion model (default claude-3-opus-20240229)'
     API_DOC_PARAMS_MAX_TOKENS = 'Completion max tokens (default 1024)'
-    API_DOC_PARAMS_JOB_DESCRIPTION = 'Job description (required)'
\ No newline at end of file
+    API_DOC_PARAMS_JOB_DESCRIPTION = 'Job description (required)'
+    API_DOC_PARAMS_WAIT = 'Seconds to wait for the result before answering PROCESSING (optional)'
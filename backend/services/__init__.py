@@ -1,13 +1,34 @@
 from .telegram import BotHandler, send_telegram_error_message, telegram_report_error
-from .web_crawling import WebCrawling
+from .web_crawling import WebCrawling, estimate_tokens
 from .pdf import PdfHandler
+from .pdf_extraction import pdf_extractor, PdfExtractor
+from .pdf_cache import pdf_cache, PdfCache
+from .uploads import open_upload
 from .timer_decorator import timer
+from .llm_clients import llm_clients, LLMClients, PoolSettings, ProviderClient
+from .metrics import metrics, TimingStats
+from .job_queue import JobQueue, JobQueueFullError, JobTimeoutError
 
 __all__ = [
   'BotHandler',
   'send_telegram_error_message',
   'telegram_report_error',
   'WebCrawling',
+  'estimate_tokens',
   'PdfHandler',
-  'timer'
+  'pdf_extractor',
+  'PdfExtractor',
+  'pdf_cache',
+  'PdfCache',
+  'open_upload',
+  'timer',
+  'llm_clients',
+  'LLMClients',
+  'PoolSettings',
+  'ProviderClient',
+  'metrics',
+  'TimingStats',
+  'JobQueue',
+  'JobQueueFullError',
+  'JobTimeoutError'
 ]
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with hit/miss counters"""
+
+    def __init__(self, maxsize: int = 128, name: str = 'cache'):
+        self.maxsize = maxsize
+        self.name = name
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = factory()
+        with self._lock:
+            # another thread may have built it meanwhile, keep the first one
+            if key in self._data:
+                return self._data[key]
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded cache whose entries expire after a per-call ttl.
+    Within stale_ttl after expiry (per call, defaults to the cache's) the stale value is served while one background load refreshes it.
+    Concurrent misses on the same key share a single load. None results are not cached.
+    """
+
+    def __init__(self, maxsize: int = 1024, stale_ttl: float = 0, name: str = 'cache', refresh_workers: int = 4):
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self._data: OrderedDict = OrderedDict()  # key -> (value, expires_at, stale_until)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix=f"{name}_refresh")
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float, stale_ttl: Optional[float] = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at, stale_until = entry
+                if now < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < stale_until:
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        self.refreshes += 1
+                        self._inflight[key] = self._refresher.submit(self._load, key, loader, ttl, stale_ttl)
+                    return value
+            self.misses += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result()
+        try:
+            value = self._load(key, loader, ttl, stale_ttl)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise e
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], ttl: float, stale_ttl: Optional[float] = None) -> Any:
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl, stale_ttl)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def set(self, key: Hashable, value: Any, ttl: float, stale_ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl
+        stale_until = expires_at + (self.stale_ttl if stale_ttl is None else stale_ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at, stale_until)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'refreshes': self.refreshes,
+                'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from .metrics import TimingStats
+
+class JobQueueFullError(Exception):
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        Exception.__init__(self, f"Job queue full ({queue_size} jobs waiting)")
+
+class JobTimeoutError(Exception):
+    def __init__(self,*args,**kwargs):
+        Exception.__init__(self,*args,**kwargs)
+
+class Job:
+
+    def __init__(self, id: str, fn: Callable, args: tuple, timeout: float,
+                 on_error: Optional[Callable] = None, on_done: Optional[Callable] = None, context=None):
+        self.id = id
+        self.fn = fn
+        self.args = args
+        self.timeout = timeout
+        self.on_error = on_error
+        self.on_done = on_done
+        self.context = context
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.status = 'queued'  # queued | running | retrying
+        self.attempts = 0
+
+    def remaining(self) -> float:
+        """Seconds left before the job deadline, counted from its start"""
+        started_at = self.started_at if self.started_at is not None else time.monotonic()
+        return max(0.0, self.timeout - (time.monotonic() - started_at))
+
+    def check_deadline(self):
+        if self.remaining() <= 0:
+            raise JobTimeoutError(f"Job {self.id} exceeded {self.timeout}s")
+
+class JobQueue:
+    """
+    Fixed pool of worker threads fed by a bounded FIFO queue.
+    submit() raises JobQueueFullError instead of growing past max_queue.
+    Jobs receive their Job as first argument, to honour the deadline (remaining()/check_deadline()).
+    A job id is queued once: submitting an id that is still queued, running or waiting for a retry attaches to it.
+    Failed jobs are retried max_retries times, after retry_backoff * 2^(attempt-1) seconds; on_error is called on the last failure.
+    on_submit is called when an id starts a new job and on_done when that job leaves the queue (success or last failure),
+    both under the queue lock so they never interleave with a submit attaching to the job: they must be quick.
+    on_error runs inside the job context when one is given (e.g. the app context captured by the request), including
+    for a job that expired in the queue before running.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, timeout: float,
+                 max_retries: int = 0, retry_backoff: float = 1.0):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._pending: OrderedDict[str, Job] = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._cond = threading.Condition()
+        self._workers = []
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.retried = 0
+        self.queue_wait = TimingStats()
+        self.run_time = TimingStats()
+
+    def submit(self, id: str, fn: Callable, *args, on_error: Optional[Callable] = None,
+               on_submit: Optional[Callable] = None, on_done: Optional[Callable] = None, context=None) -> int:
+        """Queues a job and returns its queue position (1 = next to run, 0 = an active job with this id is running)"""
+        with self._cond:
+            if id in self._active:
+                return self._position(id) or 0
+            if len(self._pending) >= self.max_queue:
+                self.rejected += 1
+                raise JobQueueFullError(len(self._pending))
+            job = Job(id, fn, args, self.timeout, on_error, on_done, context)
+            if on_submit:
+                on_submit(job)
+            self._pending[id] = job
+            self._active[id] = job
+            self._start_workers()
+            self._cond.notify()
+            return len(self._pending)
+
+    def position(self, id: str) -> Optional[int]:
+        """Queue position of a waiting job, None once it has started"""
+        with self._cond:
+            return self._position(id)
+
+    def _position(self, id: str) -> Optional[int]:
+        for index, job_id in enumerate(self._pending):
+            if job_id == id:
+                return index + 1
+        return None
+
+    def get(self, id: str) -> Optional[Job]:
+        """The queued, running or retrying job with this id"""
+        with self._cond:
+            return self._active.get(id)
+
+    def _retry(self, job: Job):
+        with self._cond:
+            job.status = 'queued'
+            job.enqueued_at = time.monotonic()
+            job.started_at = None
+            self._pending[job.id] = job
+            self._cond.notify()
+
+    def _finish(self, job: Job):
+        self._active.pop(job.id, None)
+        if job.on_done:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                logging.error(f"{self.name} job {job.id} done handler failed: {str(e)}")
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"{self.name}-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                _, job = self._pending.popitem(last=False)
+                job.status = 'running'
+                job.attempts += 1
+                self.running += 1
+
+            # a retry may reset the job while this attempt is being accounted
+            started_at = job.started_at = time.monotonic()
+            self.queue_wait.add(started_at - job.enqueued_at)
+            try:
+                if started_at - job.enqueued_at >= job.timeout:
+                    raise JobTimeoutError(f"Job {job.id} expired in queue")
+                job.fn(job, *job.args)
+                with self._cond:
+                    self.completed += 1
+                    self._finish(job)
+            except Exception as e:
+                logging.error(f"{self.name} job {job.id} failed (attempt {job.attempts}): {str(e)}")
+                with self._cond:
+                    if not isinstance(e, JobTimeoutError) and job.attempts <= self.max_retries:
+                        self.retried += 1
+                        job.status = 'retrying'
+                        retry = threading.Timer(self.retry_backoff * 2 ** (job.attempts - 1), self._retry, (job,))
+                        retry.daemon = True
+                        retry.start()
+                        continue
+                    if isinstance(e, JobTimeoutError):
+                        self.timed_out += 1
+                    else:
+                        self.failed += 1
+                    self._finish(job)
+                if job.on_error:
+                    try:
+                        if job.context is not None:
+                            with job.context:
+                                job.on_error(job, e)
+                        else:
+                            job.on_error(job, e)
+                    except Exception as error:
+                        logging.error(f"{self.name} job {job.id} error handler failed: {str(error)}")
+            finally:
+                self.run_time.add(time.monotonic() - started_at)
+                with self._cond:
+                    self.running -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'queued': len(self._pending),
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timed_out': self.timed_out,
+                'rejected': self.rejected,
+                'retried': self.retried,
+                'queue_wait': self.queue_wait.to_dict(),
+                'run_time': self.run_time.to_dict()
+            }
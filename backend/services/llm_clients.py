@@ -0,0 +1,156 @@
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Tuple
+import anthropic
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from config import config
+
+@dataclass
+class PoolSettings:
+    max_connections: int = config.LLM_POOL_MAX_CONNECTIONS
+    max_keepalive_connections: int = config.LLM_POOL_MAX_KEEPALIVE
+    keepalive_expiry: float = config.LLM_POOL_KEEPALIVE_EXPIRY
+    connect_timeout: float = config.LLM_CONNECT_TIMEOUT
+    read_timeout: float = config.LLM_READ_TIMEOUT
+    max_retries: int = config.LLM_MAX_RETRIES
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+@dataclass
+class ProviderClient:
+    sync_factory: Callable[[httpx.Client, PoolSettings], Any]
+    async_factory: Callable[[httpx.AsyncClient, PoolSettings], Any]
+    pool: PoolSettings = field(default_factory=PoolSettings)
+
+class LLMClients:
+    """
+    Shared upstream SDK clients, one keep-alive connection pool per provider.
+    Async clients are created per event loop, since httpx pools can't be shared across loops.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers: Dict[str, ProviderClient] = {}
+        self._clients: Dict[str, Any] = {}
+        self._async_clients: Dict[Tuple[str, int], Any] = {}
+
+    def register(self, name: str, provider: ProviderClient):
+        with self._lock:
+            self._providers[name] = provider
+            self._clients.pop(name, None)
+
+    def get_pool_settings(self, name: str) -> PoolSettings:
+        return self._get_provider(name).pool
+
+    def get(self, name: str):
+        """Returns the synchronous client of the provider"""
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    provider = self._get_provider(name)
+                    http_client = httpx.Client(
+                        limits=provider.pool.limits(),
+                        timeout=provider.pool.timeout()
+                    )
+                    client = provider.sync_factory(http_client, provider.pool)
+                    self._clients[name] = client
+        return client
+
+    def get_async(self, name: str):
+        """Returns the async client of the provider bound to the running event loop"""
+        key = (name, id(asyncio.get_running_loop()))
+        client = self._async_clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._async_clients.get(key)
+                if client is None:
+                    provider = self._get_provider(name)
+                    http_client = httpx.AsyncClient(
+                        limits=provider.pool.limits(),
+                        timeout=provider.pool.timeout()
+                    )
+                    client = provider.async_factory(http_client, provider.pool)
+                    self._async_clients[key] = client
+        return client
+
+    async def aclose(self):
+        """Closes the async clients of the running event loop"""
+        loop_id = id(asyncio.get_running_loop())
+        with self._lock:
+            keys = [key for key in self._async_clients if key[1] == loop_id]
+            clients = [self._async_clients.pop(key) for key in keys]
+        for client in clients:
+            await client.close()
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    def _get_provider(self, name: str) -> ProviderClient:
+        provider = self._providers.get(name)
+        if provider is None:
+            raise ValueError(f"Unknown LLM client: {name}")
+        return provider
+
+
+llm_clients = LLMClients()
+
+llm_clients.register('anthropic', ProviderClient(
+    sync_factory=lambda http_client, pool: anthropic.Anthropic(
+        api_key=config.ANTHROPIC_API_KEY,
+        http_client=http_client,
+        timeout=pool.timeout(),
+        max_retries=pool.max_retries),
+    async_factory=lambda http_client, pool: anthropic.AsyncAnthropic(
+        api_key=config.ANTHROPIC_API_KEY,
+        http_client=http_client,
+        timeout=pool.timeout(),
+        max_retries=pool.max_retries)
+))
+
+llm_clients.register('xai', ProviderClient(
+    sync_factory=lambda http_client, pool: anthropic.Anthropic(
+        base_url="https://api.x.ai",
+        api_key=config.XAI_API_KEY,
+        http_client=http_client,
+        timeout=pool.timeout(),
+        max_retries=pool.max_retries),
+    async_factory=lambda http_client, pool: anthropic.AsyncAnthropic(
+        base_url="https://api.x.ai",
+        api_key=config.XAI_API_KEY,
+        http_client=http_client,
+        timeout=pool.timeout(),
+        max_retries=pool.max_retries),
+    pool=PoolSettings(max_connections=50)
+))
+
+llm_clients.register('deepseek', ProviderClient(
+    sync_factory=lambda http_client, pool: OpenAI(
+        api_key=config.OPEN_ROUTER_DEEPSEEK_API_KEY,
+        base_url=config.OPEN_ROUTER_DEEPSEEK_BASE_URL,
+        http_client=http_client,
+        timeout=pool.timeout(),
+        max_retries=pool.max_retries),
+    async_factory=lambda http_client, pool: AsyncOpenAI(
+        api_key=config.OPEN_ROUTER_DEEPSEEK_API_KEY,
+        base_url=config.OPEN_ROUTER_DEEPSEEK_BASE_URL,
+        http_client=http_client,
+        timeout=pool.timeout(),
+        max_retries=pool.max_retries),
+    pool=PoolSettings(max_connections=50)
+))
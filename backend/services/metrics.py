@@ -0,0 +1,51 @@
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+class MetricsRegistry:
+    """Collects the stats of caches, queues and pools for the /metrics endpoint"""
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, source: Callable[[], Dict[str, Any]]):
+        with self._lock:
+            self._sources[name] = source
+
+    def collect(self) -> Dict[str, Any]:
+        with self._lock:
+            sources = dict(self._sources)
+        result = {}
+        for name, source in sources.items():
+            try:
+                result[name] = source()
+            except Exception as e:
+                logging.error(f"Error collecting metrics for {name}: {str(e)}")
+                result[name] = None
+        return result
+
+class TimingStats:
+    """Count/avg/max of a duration, in seconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'count': self.count,
+                'avg': self.total / self.count if self.count else 0.0,
+                'max': self.max
+            }
+
+metrics = MetricsRegistry()
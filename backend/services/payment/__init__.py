@@ -1,9 +1,11 @@
 from .decorators import check_balance
 from .llm_manager import llm_models_manager
 from .llm_models import llm_config
+from .balance_ledger import reconcile_balances
 
 __all__ = [
   'check_balance',
   'llm_models_manager',
-  'llm_config'
+  'llm_config',
+  'reconcile_balances'
 ]
\ No newline at end of file
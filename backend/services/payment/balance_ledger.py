@@ -0,0 +1,42 @@
+from decimal import Decimal
+from typing import Optional
+from flask import current_app as app
+from sqlalchemy import func
+from models import db, Users, Transactions
+
+def reconcile_balances(user_id: Optional[int] = None) -> int:
+    """
+    Recompute the running balance of each user from its transactions.
+    Fixes any drift and returns the number of corrected users.
+    """
+    users = Users.query
+    totals = db.session.query(
+        Transactions.user_id,
+        func.coalesce(func.sum(Transactions.amount), 0)
+    ).group_by(Transactions.user_id)
+    if user_id is not None:
+        users = users.filter(Users.id == user_id)
+        totals = totals.filter(Transactions.user_id == user_id)
+
+    corrected = 0
+    try:
+        # lock the users before summing: a transaction committed in between would otherwise be counted
+        # in the locked balance but not in the sum, and overwriting the balance would drop it.
+        # Concurrent balance updates wait for the commit below.
+        locked_users = users.order_by(Users.id).with_for_update().all()
+        expected = {uid: Decimal(str(total)) for uid, total in totals.all()}
+        for user in locked_users:
+            balance = expected.get(user.id, Decimal('0'))
+            if Decimal(str(user.balance or 0)) != balance:
+                app.logger.warning(
+                    f"Balance drift for user {user.id}: ledger={user.balance} transactions={balance}"
+                )
+                user.balance = balance
+                corrected += 1
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+    app.logger.info(f"Balance reconciliation finished, {corrected} user(s) corrected")
+    return corrected
@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime, timezone
 from decimal import Decimal
 from flask import current_app as app
-from models import TransactionType, Transactions
+from models import TransactionType, Transactions, Users
 from models import db
 from typing import Optional, List, Dict, Union
 from models.llm_data import ChatModel, ImageModel, Provider, ModelParameters
@@ -200,6 +200,7 @@ class LLMModelsManager:
         
         try:
             db.session.add(transaction)
+            Users.apply_balance_delta(user_id, transaction.amount)
             db.session.commit()
             return transaction
         except Exception as e:
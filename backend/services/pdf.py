@@ -1,37 +1,131 @@
 import requests
-from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from typing import Callable, Iterator, List, Optional
 from pdfminer.high_level import extract_text
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from config import config
+from res import PdfFileTooLarge
+from .pdf_cache import pdf_cache
+from .pdf_extraction import pdf_extractor
 from .timer_decorator import timer
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 class PdfHandler:
     # def __init__(self):
 
     # Main logic for processing pdf
     @timer
-    def pdf_to_chunks(self, pdf_url):
-        data = self.get_pdf_from_url(pdf_url)
-        text = extract_text(data)
-        return self.chunk_text(text)
+    def pdf_to_chunks(self, pdf_url) -> List[str]:
+        return list(self.iter_pdf_chunks(pdf_url))
 
-    # Fetches a PDF from a given URL and return it as a BytesIO object
-    def get_pdf_from_url(self, url: str) -> BytesIO:
-        # Fetch content from the URL
-        response = requests.get(url)
-        response.raise_for_status()
+    # Yields the chunks of a PDF as its page ranges are extracted (on the extraction process pool),
+    # without holding the whole document text in memory. Chunks of a PDF seen before come from the PDF cache.
+    # on_progress receives (pages extracted, pages) as the PDF is extracted; it isn't called for cached chunks
+    def iter_pdf_chunks(self, pdf_url, chunk_size=512, chunk_overlap=30,
+                        on_progress: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+        kind = f"chunks-{chunk_size}-{chunk_overlap}.jsonl"
+        with self.open_pdf_url(pdf_url) as response:
+            url_key = pdf_cache.url_key(pdf_url, response.headers)
+            cached = pdf_cache.iter_chunks(url_key, kind)
+            if cached is None:
+                data = self.spool_response(response)
+        if cached is not None:
+            yield from cached
+            return
 
-        # Get the content as a BytesIO object
-        pdf_data = BytesIO(response.content)
-        return pdf_data
+        with data:
+            content_key = pdf_cache.content_key(data)
+            cached = pdf_cache.iter_chunks(content_key, kind)
+            if cached is not None:
+                pdf_cache.alias(content_key, kind, url_key)
+                yield from cached
+                return
 
-    # Creates chunks from provided text
-    def chunk_text(self, text, chunk_size=512, chunk_overlap=30, separators=None):
-        text_splitter = RecursiveCharacterTextSplitter(
+            text_splitter = self.get_text_splitter(chunk_size, chunk_overlap)
+            carry = ''
+            with pdf_cache.chunk_writer([content_key, url_key], kind) as cache_chunk:
+                for page_text in pdf_extractor.iter_text(data, on_progress):
+                    # the last chunk of a page may continue on the next one
+                    chunks = text_splitter.split_text(carry + page_text)
+                    if not chunks:
+                        continue
+                    for chunk in chunks[:-1]:
+                        cache_chunk(chunk)
+                        yield chunk
+                    carry = chunks[-1] + '\n'
+                if carry.strip():
+                    cache_chunk(carry.strip())
+                    yield carry.strip()
+
+    # Text of a PDF (bytes, path or file object), extracted once per distinct content
+    def get_pdf_text(self, pdf, *keys) -> str:
+        content_key = pdf_cache.content_key(pdf)
+        text = pdf_cache.read_text(content_key)
+        if text is None:
+            text = pdf_extractor.extract_text(pdf)
+            pdf_cache.write_text([content_key, *keys], text)
+        else:
+            pdf_cache.alias(content_key, 'txt', *keys)
+        return text
+
+    # Text of a remote PDF. Not downloaded again when the server validators (ETag/Last-Modified) match a cached one
+    def get_pdf_text_from_url(self, url: str) -> str:
+        with self.open_pdf_url(url) as response:
+            url_key = pdf_cache.url_key(url, response.headers)
+            text = pdf_cache.read_text(url_key)
+            if text is not None:
+                return text
+            data = self.spool_response(response)
+        with data:
+            return self.get_pdf_text(data, url_key)
+
+    # Fetches a PDF from a given URL in chunks, up to PDF_MAX_DOWNLOAD_SIZE bytes.
+    # Returns a file object kept in memory for small files and spilled to a temp file for large ones; close it when done
+    def get_pdf_from_url(self, url: str, max_size: int = None) -> SpooledTemporaryFile:
+        with self.open_pdf_url(url) as response:
+            return self.spool_response(response, max_size)
+
+    def open_pdf_url(self, url: str) -> requests.Response:
+        response = requests.get(url, stream=True, timeout=30)
+        try:
+            response.raise_for_status()
+        except Exception as e:
+            response.close()
+            raise e
+        return response
+
+    def spool_response(self, response: requests.Response, max_size: int = None) -> SpooledTemporaryFile:
+        max_size = max_size or config.PDF_MAX_DOWNLOAD_SIZE
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > max_size:
+            raise PdfFileTooLarge(f"PDF file larger than {max_size} bytes")
+
+        pdf_data = SpooledTemporaryFile(max_size=config.PDF_SPOOL_MAX_SIZE, suffix='.pdf')
+        try:
+            size = 0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise PdfFileTooLarge(f"PDF file larger than {max_size} bytes")
+                pdf_data.write(chunk)
+            pdf_data.seek(0)
+            return pdf_data
+        except Exception as e:
+            pdf_data.close()
+            raise e
+
+    def get_text_splitter(self, chunk_size=512, chunk_overlap=30, separators=None):
+        return RecursiveCharacterTextSplitter(
             separators=separators,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
         )
+
+    # Creates chunks from provided text
+    def chunk_text(self, text, chunk_size=512, chunk_overlap=30, separators=None):
+        text_splitter = self.get_text_splitter(chunk_size, chunk_overlap, separators)
         return text_splitter.split_text(text)
 
     # Extracts text from a given PDF file and writes the extracted text to an output file
@@ -44,4 +138,4 @@ class PdfHandler:
             
             print(f"Text extracted and saved to {output_text_file}")
         except Exception as e:
-            print(f"An error occurred: {str(e)}")
\ No newline at end of file
+            print(f"An error occurred: {str(e)}")
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Union
+from uuid import uuid4
+from config import config
+from .metrics import metrics
+
+READ_CHUNK_SIZE = 64 * 1024
+
+class _CacheFile:
+    """Cache file whose failed writes are dropped instead of failing the caller"""
+
+    def __init__(self, file: IO[str]):
+        self.file = file
+        self.failed = False
+
+    def write(self, text: str):
+        if self.failed:
+            return
+        try:
+            self.file.write(text)
+        except OSError as e:
+            self.failed = True
+            logging.warning(f"Unable to write PDF cache file {self.file.name}: {str(e)}")
+
+    def close(self):
+        if self.file.closed:
+            return
+        try:
+            self.file.close()
+        except OSError as e:
+            self.failed = True
+            logging.warning(f"Unable to write PDF cache file {self.file.name}: {str(e)}")
+
+class PdfCache:
+    """
+    On-disk cache of the text and chunks extracted from PDFs, shared by the workers using the same directory.
+    Entries are keyed by the SHA-256 of the PDF bytes, or of the URL and its ETag/Last-Modified for remote files.
+    When the directory grows past max_size bytes, the least recently used entries are removed.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory and self.max_size > 0)
+
+    def content_key(self, pdf: Union[bytes, str, IO[bytes]]) -> str:
+        """SHA-256 of PDF bytes, of a file path or of a seekable file object (rewound afterwards)"""
+        digest = hashlib.sha256()
+        if isinstance(pdf, bytes):
+            digest.update(pdf)
+        elif isinstance(pdf, str):
+            with open(pdf, 'rb') as pdf_file:
+                for block in iter(lambda: pdf_file.read(READ_CHUNK_SIZE), b''):
+                    digest.update(block)
+        else:
+            pdf.seek(0)
+            for block in iter(lambda: pdf.read(READ_CHUNK_SIZE), b''):
+                digest.update(block)
+            pdf.seek(0)
+        return digest.hexdigest()
+
+    def url_key(self, url: str, headers) -> Optional[str]:
+        """Key of a remote PDF, None when the server sends neither ETag nor Last-Modified"""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return None
+        return hashlib.sha256(f"{url}\0{etag or ''}\0{last_modified or ''}".encode()).hexdigest()
+
+    def path(self, key: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{key}.{kind}")
+
+    def _lookup(self, key: Optional[str], kind: str) -> Optional[str]:
+        if not self.enabled or not key:
+            return None
+        path = self.path(key, kind)
+        try:
+            os.utime(path)  # recently used
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def read_text(self, key: Optional[str], kind: str = 'txt') -> Optional[str]:
+        path = self._lookup(key, kind)
+        if not path:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as cached:
+                return cached.read()
+        except OSError:
+            return None
+
+    def write_text(self, keys: Iterable[Optional[str]], text: str, kind: str = 'txt'):
+        with self.writer(keys, kind) as cached:
+            if cached:
+                cached.write(text)
+
+    def iter_chunks(self, key: Optional[str], kind: str) -> Optional[Iterator[str]]:
+        """The cached chunks, one JSON string per line, or None on a miss"""
+        path = self._lookup(key, kind)
+        if not path:
+            return None
+        try:
+            cached = open(path, 'r', encoding='utf-8')
+        except OSError:
+            return None
+        return self._read_chunks(cached)
+
+    def _read_chunks(self, cached: IO[str]) -> Iterator[str]:
+        with cached:
+            for line in cached:
+                yield json.loads(line)
+
+    @contextmanager
+    def chunk_writer(self, keys: Iterable[Optional[str]], kind: str):
+        """Yields a function storing one chunk. The entry is only committed if the block completes"""
+        with self.writer(keys, kind) as cached:
+            def write(chunk: str):
+                if cached:
+                    cached.write(json.dumps(chunk) + '\n')
+            yield write
+
+    @contextmanager
+    def writer(self, keys: Iterable[Optional[str]], kind: str):
+        """
+        Yields a text file moved under every key once the block completes, or None when caching is off.
+        The cache never fails the caller: when the directory can't be written, a warning is logged,
+        the writes are dropped and nothing is stored.
+        """
+        keys = [key for key in keys if key]
+        if not self.enabled or not keys:
+            yield None
+            return
+        tmp_path = os.path.join(self.directory, f".{uuid4().hex}.tmp")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_file = open(tmp_path, 'w', encoding='utf-8')
+        except OSError as e:
+            logging.warning(f"Unable to write PDF cache entry in {self.directory}: {str(e)}")
+            yield None
+            return
+        cached = _CacheFile(tmp_file)
+        try:
+            yield cached
+            cached.close()
+            if not cached.failed:
+                self._commit(tmp_path, keys, kind)
+        finally:
+            cached.close()
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _commit(self, tmp_path: str, keys: List[str], kind: str):
+        try:
+            size = os.path.getsize(tmp_path)
+            for key in keys[1:]:
+                self._link(tmp_path, self.path(key, kind))
+            os.replace(tmp_path, self.path(keys[0], kind))
+        except OSError as e:
+            logging.warning(f"Unable to write PDF cache entry {keys[0]}: {str(e)}")
+            return
+        self._add_size(size * len(keys))
+
+    def alias(self, key: Optional[str], kind: str, *aliases: Optional[str]):
+        """Makes an existing entry also reachable under other keys"""
+        if not self.enabled or not key:
+            return
+        for alias in aliases:
+            if alias and alias != key and not os.path.exists(self.path(alias, kind)):
+                try:
+                    self._link(self.path(key, kind), self.path(alias, kind))
+                    size = os.path.getsize(self.path(alias, kind))
+                except OSError as e:
+                    logging.warning(f"Unable to alias PDF cache entry {key}: {str(e)}")
+                    continue
+                self._add_size(size)
+
+    def _link(self, source: str, target: str):
+        tmp_target = f"{target}.{uuid4().hex}.tmp"
+        try:
+            try:
+                os.link(source, tmp_target)
+            except OSError:
+                with open(source, 'rb') as src, open(tmp_target, 'wb') as dst:
+                    for block in iter(lambda: src.read(READ_CHUNK_SIZE), b''):
+                        dst.write(block)
+            os.replace(tmp_target, target)
+        finally:
+            if os.path.exists(tmp_target):
+                os.remove(tmp_target)
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _add_size(self, size: int):
+        with self._lock:
+            try:
+                self._evict(size)
+            except OSError as e:
+                self._size = None  # recounted on the next write
+                logging.warning(f"Unable to evict PDF cache entries in {self.directory}: {str(e)}")
+
+    def _evict(self, size: int):
+        if self._size is None:
+            self._size = sum(entry_size for _, entry_size, _ in self._entries())
+        else:
+            self._size += size
+        if self._size <= self.max_size:
+            return
+        # several workers share the directory: recount before evicting, down to 90% to leave some room
+        entries = sorted(self._entries())
+        self._size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in entries:
+            if self._size <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._size -= entry_size
+                self.evictions += 1
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': self._size,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+pdf_cache = PdfCache(config.PDF_CACHE_DIR, config.PDF_CACHE_MAX_SIZE)
+metrics.register('pdf_cache', pdf_cache.stats)
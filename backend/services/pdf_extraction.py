@@ -0,0 +1,186 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from contextlib import contextmanager
+from io import BytesIO
+from tempfile import NamedTemporaryFile
+from typing import IO, Any, Callable, Dict, Iterator, Optional, Union
+from config import config
+from pdf_pages import PdfSource, count_pages, extract_pages
+from res import PdfExtractionTimeout
+from .metrics import metrics, TimingStats
+
+class PdfExtractor:
+    """
+    pdfminer text extraction on a process pool, so the CPU-bound parsing doesn't hold the GIL of the request threads.
+    Documents are split in page ranges extracted in parallel; at most max_concurrent documents are extracted at once
+    and a document taking more than timeout seconds of extraction raises PdfExtractionTimeout.
+    Sources up to inline_size bytes are sent to the workers as bytes, larger ones through a temp file.
+    """
+
+    def __init__(self, max_workers: int, max_concurrent: int, timeout: float, pages_per_task: int, inline_size: int):
+        self.max_workers = max_workers
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.pages_per_task = pages_per_task
+        self.inline_size = inline_size
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._stats_lock = threading.Lock()
+        self.active = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.pool_resets = 0
+        self.extraction_time = TimingStats()
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # forking a process running threads may copy held locks: the workers are forked from a fresh
+                # forkserver process which only preloads pdf_pages, not the application (spawn where unavailable)
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload(['pdf_pages'])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._pool
+
+    @contextmanager
+    def _source(self, pdf: Union[bytes, str, IO[bytes]]) -> Iterator[PdfSource]:
+        if isinstance(pdf, str):
+            yield pdf
+            return
+        if isinstance(pdf, bytes):
+            if len(pdf) <= self.inline_size:
+                yield pdf
+                return
+            pdf = BytesIO(pdf)
+        pdf.seek(0, os.SEEK_END)
+        size = pdf.tell()
+        pdf.seek(0)
+        if size <= self.inline_size:
+            yield pdf.read()
+            return
+        temp_file = NamedTemporaryFile(suffix='.pdf', delete=False)
+        try:
+            with temp_file:
+                shutil.copyfileobj(pdf, temp_file)
+            yield temp_file.name
+        finally:
+            os.remove(temp_file.name)
+
+    def iter_text(self, pdf: Union[bytes, str, IO[bytes]],
+                  on_progress: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+        """Yields the text of the PDF page range by page range, in order. on_progress receives (pages extracted, pages)"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PdfExtractionTimeout(f"No PDF extraction slot available after {self.timeout}s")
+        with self._stats_lock:
+            self.active += 1
+        futures = deque()
+        waited = 0.0
+
+        def result(future):
+            # only the time spent waiting on the workers counts, not the time the caller takes between pages
+            nonlocal waited
+            started_at = time.monotonic()
+            try:
+                return future.result(timeout=max(0.0, self.timeout - waited))
+            except TimeoutError:
+                # cancel() can't stop a page range already running: its worker would stay busy for good
+                self.reset_pool(pool)
+                raise PdfExtractionTimeout(f"PDF extraction took more than {self.timeout}s")
+            finally:
+                waited += time.monotonic() - started_at
+
+        try:
+            with self._source(pdf) as source:
+                pool = self.get_pool()
+                page_count = result(pool.submit(count_pages, source))
+                if on_progress:
+                    on_progress(0, page_count)
+                ranges = iter([(first, min(first + self.pages_per_task, page_count))
+                               for first in range(0, page_count, self.pages_per_task)])
+                for first, last in ranges:
+                    futures.append((pool.submit(extract_pages, source, first, last), last))
+                    if len(futures) >= self.max_workers:
+                        break
+                while futures:
+                    future, last = futures.popleft()
+                    text = result(future)
+                    next_range = next(ranges, None)
+                    if next_range:
+                        futures.append((pool.submit(extract_pages, source, *next_range), next_range[1]))
+                    if on_progress:
+                        on_progress(last, page_count)
+                    yield text
+            with self._stats_lock:
+                self.completed += 1
+        except PdfExtractionTimeout:
+            with self._stats_lock:
+                self.timed_out += 1
+            raise
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += 1
+            logging.error(f"PDF extraction failed: {str(e)}")
+            raise e
+        finally:
+            for future, _ in futures:
+                future.cancel()
+            self.extraction_time.add(waited)
+            with self._stats_lock:
+                self.active -= 1
+            self._slots.release()
+
+    def extract_text(self, pdf: Union[bytes, str, IO[bytes]]) -> str:
+        return ''.join(self.iter_text(pdf))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'workers': self.max_workers,
+                'max_concurrent': self.max_concurrent,
+                'active': self.active,
+                'completed': self.completed,
+                'timed_out': self.timed_out,
+                'failed': self.failed,
+                'pool_resets': self.pool_resets,
+                'extraction_time': self.extraction_time.to_dict()
+            }
+
+    def reset_pool(self, pool: ProcessPoolExecutor):
+        """
+        Terminates the workers of pool, the next extraction starts a new one.
+        Extractions still running on it fail
+        """
+        with self._pool_lock:
+            if self._pool is not pool:
+                return  # already replaced
+            self._pool = None
+            self.pool_resets += 1
+        logging.warning("PDF extraction timed out, restarting the extraction workers")
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+pdf_extractor = PdfExtractor(
+    max_workers=config.PDF_EXTRACTION_WORKERS,
+    max_concurrent=config.PDF_EXTRACTION_CONCURRENCY,
+    timeout=config.PDF_EXTRACTION_TIMEOUT,
+    pages_per_task=config.PDF_EXTRACTION_PAGES_PER_TASK,
+    inline_size=config.PDF_SPOOL_MAX_SIZE)
+metrics.register('pdf_extraction', pdf_extractor.stats)
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, Optional
+from flask import Response, stream_with_context
+
+# Disable proxy/browser buffering so each chunk reaches the client as soon as it is yielded
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+}
+
+@dataclass
+class StreamEvent:
+    type: str  # delta | usage
+    data: Dict[str, Any] = field(default_factory=dict)
+
+def delta(text: str) -> StreamEvent:
+    return StreamEvent('delta', {'text': text})
+
+def usage(input_tokens: Optional[int] = None, output_tokens: Optional[int] = None) -> StreamEvent:
+    return StreamEvent('usage', {'input_tokens': input_tokens, 'output_tokens': output_tokens})
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class UsageAccumulator:
+    """Merges the partial usage events a provider sends along the stream"""
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def add(self, data: Dict[str, Any]):
+        if data.get('input_tokens') is not None:
+            self.input_tokens = data['input_tokens']
+        if data.get('output_tokens') is not None:
+            self.output_tokens = data['output_tokens']
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens
+        }
+
+def sse_stream(events: Iterable[StreamEvent]) -> Iterator[str]:
+    """
+    Turns a provider event iterator into SSE frames.
+    Deltas are emitted as they arrive; the stream always ends with a usage event.
+    """
+    usage_total = UsageAccumulator()
+    try:
+        for event in events:
+            if event.type == 'usage':
+                usage_total.add(event.data)
+            else:
+                yield format_sse(event.type, event.data)
+    except Exception as e:
+        logging.error(f"Streaming error: {str(e)}")
+        yield format_sse('error', {'message': str(e)})
+    yield format_sse('usage', usage_total.to_dict())
+
+async def async_sse_stream(events: AsyncIterable[StreamEvent]) -> AsyncIterator[str]:
+    """Async version of sse_stream"""
+    usage_total = UsageAccumulator()
+    try:
+        async for event in events:
+            if event.type == 'usage':
+                usage_total.add(event.data)
+            else:
+                yield format_sse(event.type, event.data)
+    except Exception as e:
+        logging.error(f"Streaming error: {str(e)}")
+        yield format_sse('error', {'message': str(e)})
+    yield format_sse('usage', usage_total.to_dict())
+
+class EventRelay:
+    """
+    Hands the events produced on a worker thread to the response streaming them:
+    iterated by a WSGI response, or async iterated on the event loop given at creation by an ASGI one.
+    The producer calls put() for each event and close() at the end, or fail(error) to raise error in the response.
+    cancelled is set once the response stops reading, so the producer can give up. Waiting for the
+    end takes at most timeout seconds.
+    """
+
+    _END = object()
+
+    def __init__(self, timeout: float, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.timeout = timeout
+        self.cancelled = threading.Event()
+        self._loop = loop
+        self._queue = asyncio.Queue() if loop else queue.Queue()
+
+    def put(self, event: Any):
+        if self._loop is None:
+            self._queue.put(event)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        except RuntimeError:  # event loop closed
+            self.cancelled.set()
+
+    def close(self):
+        self.put(self._END)
+
+    def fail(self, error: BaseException):
+        self.put(error)
+
+    def _timeout_error(self) -> TimeoutError:
+        return TimeoutError(f"No response after {self.timeout}s")
+
+    def _unwrap(self, event):
+        if isinstance(event, BaseException):
+            raise event
+        return event
+
+    def __iter__(self) -> Iterator[StreamEvent]:
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                try:
+                    event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    raise self._timeout_error()
+                if event is self._END:
+                    return
+                yield self._unwrap(event)
+        finally:
+            self.cancelled.set()
+
+    async def __aiter__(self) -> AsyncIterator[StreamEvent]:
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    raise self._timeout_error()
+                if event is self._END:
+                    return
+                yield self._unwrap(event)
+        finally:
+            self.cancelled.set()
+
+def sse_response(events: Iterable[StreamEvent]) -> Response:
+    return Response(stream_with_context(sse_stream(events)), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+# Anthropic messages stream (also used by xAI)
+def anthropic_events(response) -> Iterator[StreamEvent]:
+    for event in response:
+        if event.type == 'message_start':
+            yield usage(input_tokens=event.message.usage.input_tokens)
+        elif event.type == 'content_block_delta':
+            yield delta(event.delta.text)
+        elif event.type == 'message_delta':
+            yield usage(output_tokens=event.usage.output_tokens)
+
+async def async_anthropic_events(response) -> AsyncIterator[StreamEvent]:
+    async for event in response:
+        if event.type == 'message_start':
+            yield usage(input_tokens=event.message.usage.input_tokens)
+        elif event.type == 'content_block_delta':
+            yield delta(event.delta.text)
+        elif event.type == 'message_delta':
+            yield usage(output_tokens=event.usage.output_tokens)
+
+# OpenAI chat completion chunks (DeepSeek/OpenRouter, litellm)
+def _openai_chunk_events(chunk) -> Iterator[StreamEvent]:
+    choices = getattr(chunk, 'choices', None)
+    if choices and getattr(choices[0], 'delta', None) is not None:
+        content = getattr(choices[0].delta, 'content', None)
+        if content:
+            yield delta(content)
+    if getattr(chunk, 'usage', None) is not None:
+        chunk_usage = dict(chunk.usage)
+        yield usage(chunk_usage.get('prompt_tokens', 0), chunk_usage.get('completion_tokens', 0))
+
+def openai_events(response) -> Iterator[StreamEvent]:
+    for chunk in response:
+        yield from _openai_chunk_events(chunk)
+
+async def async_openai_events(response) -> AsyncIterator[StreamEvent]:
+    async for chunk in response:
+        for event in _openai_chunk_events(chunk):
+            yield event
@@ -0,0 +1,36 @@
+import os
+import shutil
+from contextlib import contextmanager
+from io import BytesIO
+from tempfile import NamedTemporaryFile
+from typing import IO, Iterator
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+from config import config
+
+@contextmanager
+def open_upload(file: FileStorage, max_memory_size: int = None) -> Iterator[IO[bytes]]:
+    """
+    Seekable file object with the content of an upload, named after its (secured) filename so the extension is kept.
+    Uploads up to max_memory_size bytes are read in memory, larger ones are copied to a unique temp file.
+    Both, and the upload itself, are closed (and the temp file removed) on exit
+    """
+    max_memory_size = max_memory_size if max_memory_size is not None else config.UPLOAD_SPOOL_MAX_SIZE
+    filename = secure_filename(file.filename or '') or 'upload'
+    stream = file.stream
+    try:
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        if size <= max_memory_size:
+            upload = BytesIO(stream.read())
+            upload.name = filename
+            with upload:
+                yield upload
+        else:
+            with NamedTemporaryFile(suffix=os.path.splitext(filename)[1]) as upload:
+                shutil.copyfileobj(stream, upload)
+                upload.seek(0)
+                yield upload
+    finally:
+        file.close()
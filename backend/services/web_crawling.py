@@ -1,13 +1,20 @@
 import logging
 import requests
+from typing import Callable, Iterator, List, Optional
 from config import config
 
+def estimate_tokens(text: str) -> int:
+    """Token count estimate, ~4 characters per token"""
+    return (len(text) + 3) // 4
+
 class WebCrawling:
 
     def __init__(self):
         self.base_url = config.WEB_CRAWLER_HTTP 
+        self.chunk_tokens = config.WEB_CRAWL_CHUNK_TOKENS
+        self.overlap_tokens = config.WEB_CRAWL_CHUNK_OVERLAP
 
-    def get_web_content(self, url, username=None, password=None):
+    def fetch_web_content(self, url, username=None, password=None):
         if not url.startswith("https://"):
             url = "https://" + url
         credentials = f"&username={username}&password={password}" if username and password else ""
@@ -20,42 +27,95 @@ class WebCrawling:
             logging.info(
                 f"Webcrawling {url} => Tags processed: {len(result['elements']) if 'elements' in result else 0}"
             )
-            chunks = self.parse_web_content(result['elements'])
-            return {
-                "urlText": chunks,
-                "elapsedTime": result.get("elapsedTime", 0),
-                "networkTraffic": result.get("networkTraffic", 0),
-                "fees": 0.5,
-                "oneFees": 0.5,
-            }
+            return result
         except requests.exceptions.RequestException as e:
             logging.error(e)
             raise e
 
-    def clean_web_crawl(self, chunks):
-        filter_chunks = [i for i in chunks if i['tagName'] != 'a' and i['tagName'] != 'code']
-        return [i['text'] for i in filter_chunks]
+    def get_web_content(self, url, username=None, password=None):
+        result = self.fetch_web_content(url, username, password)
+        chunks = self.parse_web_content(result['elements'])
+        return {
+            "urlText": chunks,
+            "elapsedTime": result.get("elapsedTime", 0),
+            "networkTraffic": result.get("networkTraffic", 0),
+            "fees": 0.5,
+            "oneFees": 0.5,
+        }
+
+    def iter_web_content(self, url, username=None, password=None,
+                         on_progress: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+        """Chunks of a crawled page, yielded as they are assembled. on_progress receives (elements read, elements)"""
+        result = self.fetch_web_content(url, username, password)
+        elements = result['elements']
+        if on_progress:
+            elements = self.track_elements(elements, on_progress)
+        yield from self.iter_web_chunks(elements)
+
+    def track_elements(self, elements, on_progress: Callable[[int, int], None]) -> Iterator[dict]:
+        total = len(elements)
+        on_progress(0, total)
+        for index, element in enumerate(elements):
+            yield element
+            on_progress(index + 1, total)
+
+    def clean_web_crawl(self, chunks) -> Iterator[str]:
+        return (i['text'] for i in chunks if i['tagName'] != 'a' and i['tagName'] != 'code')
     
-    def parse_web_content(self, input_array):
-        max_words = 24000
-        concatenated_text = ''
-        current_word_count = 0
-        chunks = []
-        no_duplicates = list(set(self.clean_web_crawl(input_array)))
-        
-        for item in no_duplicates:
-            words = item.split()
-            word_count = len(words)
-            
-            if current_word_count + word_count <= max_words:
-                concatenated_text += item + ' '
-                current_word_count += word_count
-            else:
-                chunks.append(concatenated_text)
-                concatenated_text = ''
-                current_word_count = 0
-
-        if concatenated_text != '':
-            chunks.append(concatenated_text)
-        
-        return chunks
\ No newline at end of file
+    def parse_web_content(self, input_array) -> List[str]:
+        return list(self.iter_web_chunks(input_array))
+
+    def iter_web_chunks(self, input_array, chunk_tokens: int = None, overlap_tokens: int = None) -> Iterator[str]:
+        """
+        Groups the crawled texts, in page order and without repeats, into chunks of about chunk_tokens tokens.
+        A chunk starts with the last overlap_tokens of the previous one. Texts too long for a chunk are split on words
+        """
+        chunk_tokens = chunk_tokens or self.chunk_tokens
+        overlap_tokens = min(overlap_tokens if overlap_tokens is not None else self.overlap_tokens, chunk_tokens // 2)
+        seen = set()
+        parts: List[str] = []
+        tokens = 0
+        for text in self.clean_web_crawl(input_array):
+            text = (text or '').strip()
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            for piece in self.split_text(text, chunk_tokens - overlap_tokens):
+                piece_tokens = estimate_tokens(piece)
+                if parts and tokens + piece_tokens > chunk_tokens:
+                    yield ' '.join(parts)
+                    parts = self.get_overlap(parts, overlap_tokens)
+                    tokens = sum(estimate_tokens(part) for part in parts)
+                parts.append(piece)
+                tokens += piece_tokens
+        if parts:
+            yield ' '.join(parts)
+
+    def split_text(self, text: str, max_tokens: int) -> Iterator[str]:
+        if estimate_tokens(text) <= max_tokens:
+            yield text
+            return
+        words: List[str] = []
+        tokens = 0
+        for word in text.split():
+            word_tokens = estimate_tokens(word + ' ')
+            if words and tokens + word_tokens > max_tokens:
+                yield ' '.join(words)
+                words, tokens = [], 0
+            words.append(word)
+            tokens += word_tokens
+        if words:
+            yield ' '.join(words)
+
+    def get_overlap(self, parts: List[str], overlap_tokens: int) -> List[str]:
+        """Trailing words of a chunk, up to overlap_tokens"""
+        if overlap_tokens <= 0:
+            return []
+        words: List[str] = []
+        tokens = 0
+        for word in reversed(' '.join(parts).split()):
+            tokens += estimate_tokens(word + ' ')
+            if tokens > overlap_tokens:
+                break
+            words.append(word)
+        return [' '.join(reversed(words))] if words else []
@@ -1,6 +1,7 @@
 from .chromadb_storage import ChromaStorage
 from chromadb.config import Settings
 from config import config
+from services import metrics
 
 
 client_settings = Settings(
@@ -10,3 +11,4 @@ client_settings = Settings(
 
 path = config.CHROMA_SERVER_PATH
 chromadb = ChromaStorage(path, client_settings)
+metrics.register('chroma_caches', chromadb.cache_stats)
@@ -1,18 +1,88 @@
 
 from llama_index.core import Document, VectorStoreIndex, ServiceContext, PromptHelper
+from llama_index.core import Settings as LlamaSettings
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from llama_index.embeddings.openai import OpenAIEmbedding
 # from llama_index.core.llms. import LLMPredictor
 from llama_index.vector_stores.chroma.base import ChromaVectorStore
-from llama_index.core.storage import StorageContext
 import chromadb
 from chromadb.config import Settings
 import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 from langchain.chat_models import ChatOpenAI
 from config import config
+from services.cache import LRUCache
+
+class IngestionProgress:
+    """
+    Chunks embedded out of the chunks produced so far, and how far the producer is in its source (crawled elements,
+    PDF pages) when it reports it. While chunks are still being produced, the source size is the only known denominator.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.done = 0
+        self.source_total = 0
+        self.source_done = 0
+        self._lock = threading.Lock()
+
+    def add(self, count: int):
+        with self._lock:
+            self.done += count
+
+    def add_total(self, count: int):
+        with self._lock:
+            self.total += count
+
+    def set_source(self, done: int, total: int):
+        with self._lock:
+            self.source_done = done
+            self.source_total = total
+
+    def reset(self):
+        with self._lock:
+            self.total = 0
+            self.done = 0
+            self.source_total = 0
+            self.source_done = 0
+
+    def percent(self) -> Optional[int]:
+        """Percent complete, None while the source size is unknown"""
+        with self._lock:
+            if not self.source_total:
+                return None
+            if not self.total:
+                return 0
+            # the chunks embedded so far, scaled by the part of the source they come from
+            return int(100 * min(1.0, self.source_done / self.source_total) * self.done / self.total)
+
 class ChromaStorage:
 
     def __init__(self, path, settings: Settings):
         self.path = path
         self.db = chromadb.HttpClient(host=config.CHROMADB_SERVER_URL, port='8000')
+        # collection name -> VectorStoreIndex, and -> idle chat engines (an engine keeps chat memory, so one request at a time)
+        self.index_cache = LRUCache(config.VECTOR_INDEX_CACHE_SIZE, name='vector_indexes')
+        self.chat_engines = LRUCache(config.VECTOR_INDEX_CACHE_SIZE, name='chat_engines')
+        self.chat_engine_pool_size = config.CHAT_ENGINE_POOL_SIZE
+        self._engines_lock = threading.Lock()
+        self.engines_reused = 0
+        self.engines_built = 0
+        self.embedding_batch_size = config.EMBEDDING_BATCH_SIZE
+        self.embedding_concurrency = config.EMBEDDING_CONCURRENCY
+        self._embed_model = None
+        self._ingestions: Dict[str, IngestionProgress] = {}
+        # chunk hash -> vector, shared by every collection so identical chunks are embedded once.
+        # One Chroma collection per embedding model, as a collection holds a single vector size
+        self.embedding_cache_name = config.EMBEDDING_CACHE_COLLECTION
+        self._embedding_caches = {}
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+        self._embedding_stats_lock = threading.Lock()
+        self._ingestions_lock = threading.Lock()
 
     def get_path(self):
         return self.path
@@ -48,39 +118,211 @@ class ChromaStorage:
         return collection
     
     def store_text_array_from_url(self, text_array, collection_name): 
-        collection = self.get_collection(collection_name)
-        documents = [Document(text=t) for t in text_array.get('urlText')]
-        vector_store = ChromaVectorStore(chroma_collection=collection)
-        storage_context = StorageContext.from_defaults(
-            vector_store=vector_store)
-        service_context = self.get_llms()
-        index = VectorStoreIndex.from_documents(
-            documents, storage_context=storage_context, service_context=service_context)
+        return self.ingest_texts(text_array.get('urlText'), collection_name)
 
     
-    def store_text_array(self, text_array, collection_name):
-        collection = self.get_collection(collection_name)
-        documents = [Document(text=t) for t in text_array]
-        vector_store = ChromaVectorStore(chroma_collection=collection)
-        storage_context = StorageContext.from_defaults(
-            vector_store=vector_store)
-        service_context = self.get_llms()
-        index = VectorStoreIndex.from_documents(
-            documents, storage_context=storage_context, service_context=service_context)
+    def store_text_array(self, text_array, collection_name, progress: Optional[IngestionProgress] = None,
+                         check_deadline: Optional[Callable[[], None]] = None):
+        return self.ingest_texts(text_array, collection_name, progress, check_deadline)
+
+    def get_embed_model(self):
+        if self._embed_model is None:
+            self._embed_model = OpenAIEmbedding(embed_batch_size=self.embedding_batch_size)
+        return self._embed_model
+
+    def ingest_texts(self, texts: Iterable[str], collection_name, progress: Optional[IngestionProgress] = None,
+                     check_deadline: Optional[Callable[[], None]] = None) -> int:
+        """
+        Splits the texts into nodes, embeds them in batches on embedding_concurrency threads
+        and upserts every batch into the collection as soon as it is embedded.
+        texts may be a generator: batches are embedded while it is still producing, with a bounded number in flight.
+        Chunks already embedded by any collection reuse the cached vector instead of calling the embedding API.
+        Node ids are derived from the collection and position, so a retried ingestion overwrites instead of duplicating.
+        progress is updated as nodes are embedded, and check_deadline is called between batches to abort the ingestion.
+        Returns the number of nodes stored; the collection is only created once there is one
+        """
+        progress = progress or IngestionProgress()
+        progress.reset()
+        collection = None
+        embed_model = self.get_embed_model()
+
+        def store(future):
+            nonlocal collection
+            batch, embedded = future.result()
+            if check_deadline:
+                check_deadline()
+            if collection is None:
+                collection = self.get_collection(collection_name)
+            self.cache_embeddings(embed_model, embedded)
+            self.upsert_nodes(collection, batch)
+            progress.add(len(batch))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.embedding_concurrency, thread_name_prefix='embedding') as executor:
+                pending = set()
+                for batch in self.iter_node_batches(texts, collection_name):
+                    if check_deadline:
+                        check_deadline()
+                    progress.add_total(len(batch))
+                    missing = self.load_cached_embeddings(embed_model, batch)
+                    pending.add(executor.submit(self.embed_nodes, embed_model, batch, missing))
+                    while len(pending) >= self.embedding_concurrency * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            store(future)
+                for future in pending:
+                    store(future)
+            return progress.total
+        finally:
+            self.invalidate_collection(collection_name)
+
+    def iter_node_batches(self, texts: Iterable[str], collection_name) -> Iterator[List]:
+        batch = []
+        position = 0
+        for text in texts:
+            for node in LlamaSettings.node_parser.get_nodes_from_documents([Document(text=text)]):
+                node.id_ = f"{collection_name}-{position}"
+                position += 1
+                batch.append(node)
+                if len(batch) == self.embedding_batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def embed_nodes(self, embed_model, nodes, missing):
+        """Embeds the nodes without a cached vector, returns (nodes, newly embedded nodes)"""
+        if missing:
+            embeddings = embed_model.get_text_embedding_batch([node.get_content() for node in missing])
+            for node, embedding in zip(missing, embeddings):
+                node.embedding = embedding
+        return nodes, missing
+
+    def get_embedding_cache(self, embed_model):
+        cache = self._embedding_caches.get(embed_model.model_name)
+        if cache is None:
+            model_name = ''.join(c if c.isalnum() or c in ('_', '-') else '-' for c in embed_model.model_name)
+            cache = self.get_collection(f"{self.embedding_cache_name}-{model_name}"[:63])
+            self._embedding_caches[embed_model.model_name] = cache
+        return cache
+
+    def get_embedding_key(self, embed_model, text) -> str:
+        return hashlib.sha256(f"{embed_model.model_name}\0{text}".encode()).hexdigest()
+
+    def load_cached_embeddings(self, embed_model, nodes) -> List:
+        """Sets the cached vectors on the nodes and returns the nodes still to embed"""
+        keys = [self.get_embedding_key(embed_model, node.get_content()) for node in nodes]
+        cached = self.get_embedding_cache(embed_model).get(ids=list(dict.fromkeys(keys)), include=['embeddings'])
+        vectors = dict(zip(cached['ids'], cached['embeddings']))
+        missing = []
+        for key, node in zip(keys, nodes):
+            if key in vectors:
+                node.embedding = list(vectors[key])
+            else:
+                missing.append(node)
+        with self._embedding_stats_lock:
+            self.embedding_hits += len(nodes) - len(missing)
+            self.embedding_misses += len(missing)
+        return missing
+
+    def cache_embeddings(self, embed_model, nodes):
+        if not nodes:
+            return
+        # a chunk repeated in the batch is stored once
+        vectors = {self.get_embedding_key(embed_model, node.get_content()): node.get_embedding() for node in nodes}
+        self.get_embedding_cache(embed_model).upsert(ids=list(vectors.keys()), embeddings=list(vectors.values()))
+
+    def upsert_nodes(self, collection, nodes):
+        # same layout as ChromaVectorStore.add, so the index reads the nodes back
+        collection.upsert(
+            ids=[node.node_id for node in nodes],
+            embeddings=[node.get_embedding() for node in nodes],
+            metadatas=[node_to_metadata_dict(node, remove_text=True, flat_metadata=True) for node in nodes],
+            documents=[node.get_content() for node in nodes])
+
+    def begin_ingestion(self, collection_name) -> IngestionProgress:
+        """Marks the collection as being ingested, from its submission until end_ingestion. Returns its progress"""
+        with self._ingestions_lock:
+            return self._ingestions.setdefault(collection_name, IngestionProgress())
+
+    def end_ingestion(self, collection_name):
+        with self._ingestions_lock:
+            self._ingestions.pop(collection_name, None)
+
+    def get_ingestion_progress(self, collection_name) -> Optional[IngestionProgress]:
+        """Progress of the collection ingestion, None when the collection is not being ingested"""
+        with self._ingestions_lock:
+            return self._ingestions.get(collection_name)
 
 
     def get_vector_index(self, collection_name):
+        index = self.index_cache.get(collection_name)
+        if index is not None:
+            return index
         collection = self.get_collection(collection_name)
         if (collection.count() > 0):
             vector_store = ChromaVectorStore(chroma_collection=collection)
             index = VectorStoreIndex.from_vector_store(
                 vector_store)
+            self.index_cache.set(collection_name, index)
             return index
         return None
+
+    @contextmanager
+    def chat_engine(self, collection_name, chat_mode):
+        """Lends an idle chat engine of the collection (or builds one), None if the collection is empty"""
+        idle = self.chat_engines.get_or_create(collection_name, list)
+        with self._engines_lock:
+            engine = idle.pop() if idle else None
+            if engine is not None:
+                self.engines_reused += 1
+        if engine is None:
+            index = self.get_vector_index(collection_name)
+            if index is None:
+                yield None
+                return
+            engine = index.as_chat_engine(chat_mode=chat_mode)
+            with self._engines_lock:
+                self.engines_built += 1
+        try:
+            yield engine
+        finally:
+            with self._engines_lock:
+                if len(idle) < self.chat_engine_pool_size:
+                    idle.append(engine)
+
+    def invalidate_collection(self, collection_name):
+        self.index_cache.invalidate(collection_name)
+        self.chat_engines.invalidate(collection_name)
+
+    def cache_stats(self):
+        with self._engines_lock:
+            lookups = self.engines_reused + self.engines_built
+            engines = {
+                'reused': self.engines_reused,
+                'built': self.engines_built,
+                'hit_rate': self.engines_reused / lookups if lookups else 0.0
+            }
+        with self._embedding_stats_lock:
+            embedded = self.embedding_hits + self.embedding_misses
+            embeddings = {
+                'hits': self.embedding_hits,
+                'misses': self.embedding_misses,
+                'hit_rate': self.embedding_hits / embedded if embedded else 0.0
+            }
+        return {
+            'vector_indexes': self.index_cache.stats(),
+            'chat_engines': engines,
+            'embeddings': embeddings
+        }
     
     def delete_collection(self, collection_name):
         self.db.delete_collection(collection_name)
+        self.invalidate_collection(collection_name)
 
     def reset_database(self):
+        self._embedding_caches.clear()
+        self.index_cache.clear()
+        self.chat_engines.clear()
         return self.db.reset()
     
\ No newline at end of file
@@ -1,4 +1,4 @@
 from .tool_base import ToolBase
 from .tool_box_base import ToolBoxBase
 from .yahoo_finance import YahooFinanceTool
-from .coin_gecko import coin_gecko_tool_box
\ No newline at end of file
+from .coin_gecko import coin_gecko_tool_box, coin_gecko_helper
\ No newline at end of file
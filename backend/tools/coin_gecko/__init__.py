@@ -1 +1 @@
-from .coin_gecko_tool import coin_gecko_tool_box
\ No newline at end of file
+from .coin_gecko_tool import coin_gecko_tool_box, helper as coin_gecko_helper
\ No newline at end of file
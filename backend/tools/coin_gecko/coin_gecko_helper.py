@@ -1,32 +1,219 @@
+import json
+import logging
+import os
+import threading
+import time
 import requests
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
 
 COIN_GECKO_URL = "https://api.coingecko.com/api/v3"
 
 class CoinGeckoHelper:
-    def __init__(self):
+    """
+    Coin list lookups. Nothing is fetched at import time: start(), called at app boot (or by the first lookup),
+    loads the cached snapshot from disk and refreshes it from CoinGecko in a background thread.
+    Price lookups arriving within price_batch_window seconds share one /simple/price request.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None, refresh_interval: Optional[int] = None, load_timeout: float = 10,
+                 price_batch_window: float = 0.05, price_batch_size: int = 250):
+        self.snapshot_path = snapshot_path
+        self.refresh_interval = refresh_interval
+        self.load_timeout = load_timeout
         self.coins_data = []
-        self.load_coins_data()
+        self.symbol_index: Dict[str, List[str]] = {}
+        self.name_index: Dict[str, str] = {}
+        self.id_index: Dict[str, str] = {}
+        self._refresh_timer = None
+        self._ready = threading.Event()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self.price_batch_window = price_batch_window
+        self.price_batch_size = price_batch_size
+        self._pending_prices: List[tuple] = []  # (coin ids, future) of the waiting lookups
+        self._pending_price_ids = set()
+        self._price_timer = None
+        self._price_lock = threading.Lock()
+        self.price_lookups = 0
+        self.price_requests = 0
+
+    def start(self):
+        """Loads the local snapshot and schedules the CoinGecko refresh, once"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+
+        coins = self.read_snapshot(self.snapshot_path)
+        snapshot_age = self.get_snapshot_age(self.snapshot_path) if coins is not None else None
+        if coins is not None:
+            self.set_coins_data(coins)
+
+        if snapshot_age is None or (self.refresh_interval and snapshot_age >= self.refresh_interval):
+            threading.Thread(target=self.refresh_coins_data, name='coin_gecko_refresh', daemon=True).start()
+        else:
+            self.schedule_refresh(self.refresh_interval - snapshot_age)
 
-    def load_coins_data(self):
+    def wait_until_ready(self):
+        self.start()
+        if not self._ready.is_set():
+            self._ready.wait(timeout=self.load_timeout)
+
+    def fetch_coins_data(self):
         endpoint = f"{COIN_GECKO_URL}/coins/list"
-        response = requests.get(endpoint)
+        response = requests.get(endpoint, timeout=30)
         if response.status_code == 200:
-            self.coins_data = response.json()
+            coins = response.json()
+            self.write_snapshot(coins)
+            return coins
         else:
             print(f"Error: {response.status_code} - {response.text}")
+            return None
+
+    def refresh_coins_data(self):
+        try:
+            coins = self.fetch_coins_data()
+            if coins is not None:
+                self.set_coins_data(coins)
+        except Exception as e:
+            logging.error(f"Error refreshing CoinGecko coin list: {str(e)}")
+        finally:
+            # don't keep lookups waiting on a CoinGecko outage
+            self._ready.set()
+            self.schedule_refresh()
+
+    def schedule_refresh(self, delay: Optional[float] = None):
+        if not self.refresh_interval:
+            return
+        delay = delay if delay is not None else self.refresh_interval
+        self._refresh_timer = threading.Timer(delay, self.refresh_coins_data)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def get_snapshot_age(self, path: Optional[str]) -> Optional[float]:
+        if not path or not os.path.isfile(path):
+            return None
+        return time.time() - os.path.getmtime(path)
+
+    def read_snapshot(self, path: Optional[str]):
+        if not path or not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as snapshot:
+                return json.load(snapshot)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Invalid CoinGecko snapshot {path}: {str(e)}")
+            return None
+
+    def write_snapshot(self, coins):
+        if not self.snapshot_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as snapshot:
+                json.dump(coins, snapshot)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logging.warning(f"Unable to write CoinGecko snapshot {self.snapshot_path}: {str(e)}")
+
+    def set_coins_data(self, coins):
+        """Builds the lookup indexes and swaps them in at once"""
+        symbol_index: Dict[str, List[str]] = {}
+        name_index: Dict[str, str] = {}
+        id_index: Dict[str, str] = {}
+        for coin in coins:
+            coin_id = coin.get("id")
+            if not coin_id:
+                continue
+            id_index[coin_id.lower()] = coin_id
+            name = (coin.get("name") or "").lower()
+            if name and name not in name_index:
+                name_index[name] = coin_id
+            symbol = (coin.get("symbol") or "").lower()
+            if symbol:
+                symbol_index.setdefault(symbol, []).append(coin_id)
+
+        # Colliding symbols (e.g. bridged/wrapped tokens): prefer the coin whose id is its own name
+        for symbol, ids in symbol_index.items():
+            if len(ids) > 1:
+                ids.sort(key=lambda coin_id: 0 if name_index.get(coin_id.replace('-', ' ')) == coin_id else 1)
+
+        self.symbol_index, self.name_index, self.id_index = symbol_index, name_index, id_index
+        self.coins_data = coins
+        self._ready.set()
+
+    def get_ids(self, symbol) -> List[str]:
+        """All the coin ids sharing a symbol, preferred first"""
+        self.wait_until_ready()
+        return list(self.symbol_index.get(symbol.lower(), []))
 
     def get_id(self, symbol):
+        self.wait_until_ready()
         symbol = symbol.lower()
-        for coin in self.coins_data:
-            if coin.get("symbol").lower() == symbol or coin.get("name").lower() == symbol:
-                return coin.get("id")
-        return None
-    
+        coin_id = self.name_index.get(symbol)
+        if coin_id:
+            return coin_id
+        ids = self.symbol_index.get(symbol)
+        if ids:
+            return ids[0]
+        return self.id_index.get(symbol)
+
     def get_price(self, ids):
-        endpoint = f"{COIN_GECKO_URL}/simple/price?ids={ids.lower()}&vs_currencies=usd"
-        response = requests.get(endpoint)
+        """Prices in USD of a comma-separated list of coin ids, fetched in a batch with the concurrent lookups"""
+        coin_ids = [coin_id.strip().lower() for coin_id in ids.split(',') if coin_id.strip()]
+        future = Future()
+        with self._price_lock:
+            self.price_lookups += 1
+            self._pending_prices.append((coin_ids, future))
+            self._pending_price_ids.update(coin_ids)
+            flush_now = len(self._pending_price_ids) >= self.price_batch_size
+            if not flush_now and self._price_timer is None:
+                self._price_timer = threading.Timer(self.price_batch_window, self.flush_prices)
+                self._price_timer.daemon = True
+                self._price_timer.start()
+        if flush_now:
+            self.flush_prices()
+
+        prices = future.result()
+        if prices is None:
+            return None
+        return {coin_id: prices[coin_id] for coin_id in coin_ids if coin_id in prices}
+
+    def flush_prices(self):
+        """Sends the pending lookups as one request and hands the result to each of them"""
+        with self._price_lock:
+            pending, self._pending_prices = self._pending_prices, []
+            coin_ids, self._pending_price_ids = self._pending_price_ids, set()
+            if self._price_timer is not None:
+                self._price_timer.cancel()
+                self._price_timer = None
+            if not pending:
+                return
+            self.price_requests += 1
+
+        try:
+            prices = self.fetch_prices(sorted(coin_ids))
+            for _, future in pending:
+                future.set_result(prices)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+
+    def fetch_prices(self, coin_ids: List[str]):
+        endpoint = f"{COIN_GECKO_URL}/simple/price?ids={','.join(coin_ids)}&vs_currencies=usd"
+        response = requests.get(endpoint, timeout=30)
         if response.status_code == 200:
             return response.json()
         else:
             print(f"Error: {response.status_code} - {response.text}")
+            return None
 
+    def price_stats(self) -> Dict[str, Any]:
+        with self._price_lock:
+            return {
+                'lookups': self.price_lookups,
+                'requests': self.price_requests,
+                'pending': len(self._pending_prices)
+            }
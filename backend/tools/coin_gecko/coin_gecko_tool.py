@@ -1,19 +1,28 @@
 import requests
 from typing import Any, Dict, List
+from config import config
+from services import metrics
 
 from .coin_gecko_helper import CoinGeckoHelper
 
 from ..tool_base import ToolBase
 from ..tool_box_base import ToolBoxBase
 
-helper = CoinGeckoHelper()
+helper = CoinGeckoHelper(
+    snapshot_path=config.COIN_GECKO_SNAPSHOT_PATH,
+    refresh_interval=config.COIN_GECKO_REFRESH_INTERVAL,
+    price_batch_window=config.COIN_GECKO_PRICE_BATCH_WINDOW,
+    price_batch_size=config.COIN_GECKO_PRICE_BATCH_SIZE)
+metrics.register('coin_gecko_prices', helper.price_stats)
 
 class CoinGeckoPrice(ToolBase):
     
     def __init__(self):
         super(CoinGeckoPrice, self).__init__(
             name='get_coin_price_info',
-            description="Uses the coingecko API to retrieve the prices in USD of one or more coins by using their unique coin ID, e.g., IDs like bitcoin (for Bitcoin, BTC) or harmony (for Harmony, ONE)")
+            description="Uses the coingecko API to retrieve the prices in USD of one or more coins by using their unique coin ID, e.g., IDs like bitcoin (for Bitcoin, BTC) or harmony (for Harmony, ONE)",
+            cache_ttl=config.COIN_GECKO_PRICE_CACHE_TTL,
+            cache_stale_ttl=config.COIN_GECKO_PRICE_CACHE_STALE_TTL)
         
     def claude_tool_definition(self) -> Dict[str, Any]:
        return {
@@ -33,7 +42,7 @@ class CoinGeckoPrice(ToolBase):
     
     def run(self, tool_input) -> Dict[str, Any]:
         try:
-            price = helper.get_price(tool_input.get('id'))
+            price = self.cached(tool_input, lambda tool_input: helper.get_price(tool_input.get('id').strip()))
             return price
 
         except Exception as e:
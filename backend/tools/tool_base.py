@@ -1,11 +1,28 @@
+import json
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
+from config import config
+from services import metrics
+from services.cache import TTLCache
+
+tool_result_cache = TTLCache(config.TOOL_CACHE_SIZE, name='tool_results')
+metrics.register('tool_result_cache', tool_result_cache.stats)
+
+def normalize_tool_input(tool_input: Dict[str, Any]) -> str:
+    """Cache key of a tool input: string values stripped and lowercased, keys sorted"""
+    normalized = {
+        key: value.strip().lower() if isinstance(value, str) else value
+        for key, value in (tool_input or {}).items()
+    }
+    return json.dumps(normalized, sort_keys=True, default=str)
 
 class ToolBase(ABC):
     
-    def __init__(self, name, description):
+    def __init__(self, name, description, cache_ttl: float = 0, cache_stale_ttl: float = 0):
         self.name = name
         self.description = description
+        self.cache_ttl = cache_ttl
+        self.cache_stale_ttl = cache_stale_ttl
 
     @abstractmethod
     def run(self, tool_name, tool_input):
@@ -21,3 +38,11 @@ class ToolBase(ABC):
        return None
     #    eturn self.name == name
 
+    def cached(self, tool_input: Dict[str, Any], fetch: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Runs fetch(tool_input) through the shared result cache when the tool has a cache_ttl.
+        An expired result is still served for cache_stale_ttl seconds while it is refreshed.
+        fetch should raise (or return None) on failure, so errors are never cached"""
+        if not self.cache_ttl:
+            return fetch(tool_input)
+        key = (self.name, normalize_tool_input(tool_input))
+        return tool_result_cache.get_or_load(key, lambda: fetch(tool_input), self.cache_ttl, self.cache_stale_ttl)
@@ -3,20 +3,21 @@ from typing import Any, Dict, List
 from .tool_base import ToolBase
 
 class ToolBoxBase():
-    tools = []
 
     def __init__(self, name, description):
         self.name = name
         self.description = description
+        self.tools: List[ToolBase] = []
+        self.tools_by_name: Dict[str, ToolBase] = {}
 
     def add_tool(self, tool: ToolBase):
+        if tool.name in self.tools_by_name:
+            raise ValueError(f"Tool {tool.name} is already registered in {self.name}")
         self.tools.append(tool)
+        self.tools_by_name[tool.name] = tool
     
     def is_supported(self, tool_name) -> ToolBase:
-        for tool in self.tools:
-            if tool.is_supported(tool_name):
-                return tool
-        return None
+        return self.tools_by_name.get(tool_name)
   
     def claude_tool_definition(self) -> List[Dict[str, Any]]:
         tool_definition: List[Dict[str, Any]] = []
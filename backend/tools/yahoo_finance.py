@@ -3,6 +3,7 @@ import yfinance as yf
 from typing import Any, Dict, List
 
 from app_types import StockInfo
+from config import config
 
 from .tool_base import ToolBase
 
@@ -11,7 +12,9 @@ class YahooFinanceTool(ToolBase):
     def __init__(self):
         super(YahooFinanceTool, self).__init__(
             name='get_ticker_info',
-            description="Get the financial information of a ticker symbol"
+            description="Get the financial information of a ticker symbol",
+            cache_ttl=config.YAHOO_FINANCE_CACHE_TTL,
+            cache_stale_ttl=config.YAHOO_FINANCE_CACHE_STALE_TTL
         )
     
     def claude_tool_definition(self) -> Dict[str, Any]:
@@ -30,13 +33,16 @@ class YahooFinanceTool(ToolBase):
             }
         }
     
+    def get_ticker_info(self, tool_input) -> str:
+        ticker = tool_input.get('ticker').strip().upper()
+        stock = yf.Ticker(ticker)
+        info = stock.info
+        stock = StockInfo(info)
+        return json.dumps(stock.to_dict())
+
     def run(self, tool_input) -> Dict[str, Any]:
         try:
-            ticker = tool_input.get('ticker')
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            stock = StockInfo(info)
-            return json.dumps(stock.to_dict())
+            return self.cached(tool_input, self.get_ticker_info)
 
         except Exception as e:
             print(f"An error occurred: {e}")